@@ -0,0 +1,248 @@
+from Graph import Graph, GraphError, NodeNotExistError
+
+# the bit layout below, as plain functions of masks, shared with code that
+#   keeps open edges as bare integers (Playout, Endgame)
+
+def edge_masks(M, N):
+    """(down, right): masks of the squares with a square below (all but the last row)
+    and with a square to the right (all but the last column), on an M x N board"""
+    down = (1 << (M*N - N)) - 1
+    right = 0
+    for r in range(M):
+        right |= ((1 << (N-1)) - 1) << (r*N)
+    return (down, right)
+
+def expand_mask(mask, down_open, right_open, N):
+    """squares one open step away from any square in mask (may include mask itself)"""
+    return ((mask & down_open) << N) | ((mask >> N) & down_open) | \
+           ((mask & right_open) << 1) | ((mask >> 1) & right_open)
+
+class BitboardGraph(Graph):
+    """Grid graph stored as bit masks instead of a dict of adjacency lists
+
+    Drop-in replacement for SpecialGraphs.GraphNet(M, N) as used by Game:
+    nodes are (row, col) tuples with 1 <= row <= M and 1 <= col <= N, and every
+    edge joins two squares that are adjacent in a cardinal direction. All edges
+    are undirected with weight 1.
+
+    Square (row, col) is bit (row-1)*N + (col-1). The open edges are two integers:
+        down_open:  bit i set if the path from square i to the square below is open
+        right_open: bit i set if the path from square i to the square on its right is open
+    A search frontier is also just a mask of squares, so flood fills and path
+    searches advance one whole layer of squares per handful of shifts/ands.
+    """
+
+    def __init__(self, M=9, N=9, graph_in=None):
+        self.M = M
+        self.N = N
+        # every square on the board
+        self.all_mask   = (1 << (M*N)) - 1
+        # squares with a neighbor below (all but last row) and to the right (all but last column)
+        self.down_mask, self.right_mask = edge_masks(M, N)
+
+        if graph_in:
+            self.down_open  = graph_in.down_open
+            self.right_open = graph_in.right_open
+        else:
+            # fully connected net
+            self.down_open  = self.down_mask
+            self.right_open = self.right_mask
+
+    def __repr__(self):
+        return "BitboardGraph(%d, %d, down=%#x, right=%#x)" % (self.M, self.N, self.down_open, self.right_open)
+
+    def duplicate(self):
+        return BitboardGraph(self.M, self.N, graph_in=self)
+
+    ######################
+    ## bit <-> node map ##
+    ######################
+
+    def node_to_bit(self, node):
+        """index of the bit for the given (row, col) square, or None if off the board"""
+        try:
+            r, c = node
+        except (TypeError, ValueError):
+            return None
+        if 1 <= r <= self.M and 1 <= c <= self.N:
+            return (r-1)*self.N + (c-1)
+        return None
+
+    def bit_to_node(self, i):
+        return (i / self.N + 1, i % self.N + 1)
+
+    def nodes_to_mask(self, nodes):
+        mask = 0
+        for n in nodes:
+            i = self.node_to_bit(n)
+            if i is None:
+                raise NodeNotExistError(n)
+            mask |= 1 << i
+        return mask
+
+    def mask_to_nodes(self, mask):
+        nodes = []
+        while mask:
+            low = mask & -mask
+            nodes.append(self.bit_to_node(low.bit_length() - 1))
+            mask ^= low
+        return nodes
+
+    def _edge_slot(self, node1, node2):
+        """return (mask_name, bit) of the stored edge between 2 squares, or (None, None)
+
+        mask_name is 'down' or 'right'; bit is the upper/left square of the pair
+        """
+        i = self.node_to_bit(node1)
+        j = self.node_to_bit(node2)
+        if i is None or j is None:
+            return (None, None)
+        (r1, c1), (r2, c2) = node1, node2
+        if c1 == c2 and abs(r1 - r2) == 1:
+            return ('down', min(i, j))
+        if r1 == r2 and abs(c1 - c2) == 1:
+            return ('right', min(i, j))
+        return (None, None)
+
+    #####################
+    ## Graph interface ##
+    #####################
+
+    def size(self):
+        return self.M * self.N
+
+    def hasNode(self, node):
+        return self.node_to_bit(node) is not None
+
+    def addNode(self, node):
+        if not self.hasNode(node):
+            raise GraphError("cannot add node {0} to a fixed grid".format(node))
+
+    def addEdge(self, e, directed=True):
+        """Open the path between 2 adjacent squares.
+
+        Edges are always undirected here, so 'directed' is ignored
+        """
+        try:
+            node1, node2, weight = e
+        except ValueError:
+            node1, node2 = e
+        kind, bit = self._edge_slot(node1, node2)
+        if kind == 'down':
+            self.down_open |= 1 << bit
+        elif kind == 'right':
+            self.right_open |= 1 << bit
+        else:
+            raise GraphError("not a grid edge: {0}".format(e))
+
+    def removeEdge(self, edge, directed=True):
+        """Close the path between 2 adjacent squares (in both directions)"""
+        try:
+            node1, node2, weight = edge
+        except ValueError:
+            node1, node2 = edge
+        kind, bit = self._edge_slot(node1, node2)
+        if kind == 'down':
+            self.down_open &= ~(1 << bit)
+        elif kind == 'right':
+            self.right_open &= ~(1 << bit)
+
+    def hasEdge(self, edge):
+        try:
+            node1, node2, weight = edge
+        except ValueError:
+            node1, node2 = edge
+            weight = 1
+        if weight != 1:
+            return False
+        kind, bit = self._edge_slot(node1, node2)
+        if kind == 'down':
+            return (self.down_open >> bit) & 1 == 1
+        elif kind == 'right':
+            return (self.right_open >> bit) & 1 == 1
+        return False
+
+    def get_adj_nodes(self, node):
+        i = self.node_to_bit(node)
+        if i is None:
+            return None
+        r, c = node
+        adj = []
+        # same order as GraphNet: up, down, left, right
+        if i >= self.N and (self.down_open >> (i - self.N)) & 1:
+            adj.append((r-1, c))
+        if (self.down_open >> i) & 1:
+            adj.append((r+1, c))
+        if i % self.N and (self.right_open >> (i - 1)) & 1:
+            adj.append((r, c-1))
+        if (self.right_open >> i) & 1:
+            adj.append((r, c+1))
+        return adj
+
+    ###################
+    ## mask searches ##
+    ###################
+
+    def expand(self, mask):
+        """all squares one open step away from any square in mask (not including mask itself)"""
+        return expand_mask(mask, self.down_open, self.right_open, self.N) & ~mask
+
+    def flood_fill(self, start_mask, stop_mask=0):
+        """return mask of all squares reachable from start_mask
+
+        if stop_mask is given, returns as soon as any square in it has been reached
+        """
+        reached = start_mask
+        frontier = start_mask
+        while frontier and not (reached & stop_mask):
+            frontier = self.expand(frontier) & ~reached
+            reached |= frontier
+        return reached
+
+    def bfs_layers(self, start_mask, stop_mask=0):
+        """list of masks: layers[d] is the squares exactly d steps from start_mask
+
+        if stop_mask is given, stops after the first layer touching it
+        """
+        layers = [start_mask]
+        reached = start_mask
+        while not (layers[-1] & stop_mask):
+            frontier = self.expand(layers[-1]) & ~reached
+            if not frontier:
+                break
+            reached |= frontier
+            layers.append(frontier)
+        return layers
+
+    def path_from_layers(self, layers, end_mask):
+        """walk back through BFS layers from a square of the last layer in end_mask
+
+        returns path as list of nodes (start first), or None if last layer misses end_mask
+        """
+        hit = layers[-1] & end_mask
+        if not hit:
+            return None
+        cur = hit & -hit
+        path = [cur]
+        for layer in reversed(layers[:-1]):
+            prev = self.expand(cur) & layer
+            cur = prev & -prev
+            path.append(cur)
+        path.reverse()
+        return [self.bit_to_node(b.bit_length() - 1) for b in path]
+
+    def hasPath(self, startnode, goalnodes):
+        start = self.nodes_to_mask([startnode])
+        goals = self.nodes_to_mask(goalnodes)
+        return bool(self.flood_fill(start, goals) & goals)
+
+    def findPathBreadthFirst(self, startnode, goalnode):
+        start = self.nodes_to_mask([startnode])
+        goal = self.nodes_to_mask([goalnode])
+        return self.path_from_layers(self.bfs_layers(start, goal), goal)
+
+    def findShortestPath(self, startnode, goalnodes):
+        """shortest path from startnode to the closest of goalnodes, or None"""
+        start = self.nodes_to_mask([startnode])
+        goals = self.nodes_to_mask(goalnodes)
+        return self.path_from_layers(self.bfs_layers(start, goals), goals)
@@ -0,0 +1,136 @@
+# Bulk replay: check that every game of an archive is legal, across a pool
+#   of processes, e.g. after a change to the rules or the engine.
+#   Two ways to check a game:
+#       fast    only the turn played is checked (pawn moves from the mover's
+#               available points, walls with wall_is_valid), and turns are
+#               played with make_turn(update_legal=False), so the legal
+#               moves/walls of every position are never built
+#       strict  Game.execute_turn with verify_legal, as in Game.replay: the
+#               turn must be one of the engine's own legal moves/walls
+#   Both give, for each game, a dict:
+#       status          OK, ILLEGAL (a turn couldn't be played),
+#                       WRONG_RESULT (the recorded winner isn't who won) or
+#                       ERROR (the replay raised an exception)
+#       plies           turns played (up to the first illegal one)
+#       illegal_ply     index in the history of the first illegal turn, or None
+#       turn            that turn, or None
+#       winner          player number who won, or 0
+#       positions       every player's square at the end, in notation
+#       walls           walls on the board at the end
+#       error           the exception message, if status is ERROR
+#
+#   usage:
+#       python BulkReplay.py <game record file> [strict] [workers]
+
+import multiprocessing
+import sys
+from time import time
+import GameRecord
+import Helpers as h
+
+OK = "ok"
+ILLEGAL = "illegal"
+WRONG_RESULT = "wrong result"
+ERROR = "error"
+
+def turn_is_legal(game_state, turn):
+    """True if turn is legal for the player to move, checking only that turn"""
+    if game_state.get_winner() is not None:
+        # game already over
+        return False
+    if turn not in h.TURN_CODES:
+        return False
+    if len(turn) == 2:
+        game_state.update_available_points()
+        return h.notation_to_point(turn) in game_state.current_player.available_points
+    return game_state.wall_is_valid(turn)
+
+def replay_game(args):
+    """replay one game. args is (number of players, starting player, history, recorded winner or None, strict)"""
+    from Game import Game
+    num_players, starting_player_num, history, recorded_winner, strict = args
+    result = {'status': OK, 'plies': 0, 'illegal_ply': None, 'turn': None}
+    try:
+        game_state = Game(num_players, starting_player_num=starting_player_num)
+        for i, turn in enumerate(history):
+            if strict:
+                # execute_turn doesn't refuse a turn after the game is won
+                legal = game_state.get_winner() is None and game_state.execute_turn(turn) > 0
+            else:
+                legal = turn_is_legal(game_state, turn)
+                if legal:
+                    game_state.make_turn(turn, update_legal=False)
+            if not legal:
+                result.update(status=ILLEGAL, illegal_ply=i, turn=turn)
+                break
+            result['plies'] = i+1
+        winner = game_state.get_winner()
+        result['winner'] = game_state.players.index(winner) + 1 if winner else 0
+        result['positions'] = [h.point_to_notation(p.position) for p in game_state.players]
+        result['walls'] = sorted(game_state.walls)
+        if result['status'] == OK and recorded_winner is not None and recorded_winner != result['winner']:
+            result['status'] = WRONG_RESULT
+    except Exception, e:
+        result.update(status=ERROR, error="%s: %s" % (type(e).__name__, e))
+    return result
+
+def replay_all(games, strict=False, workers=None, chunksize=64):
+    """generator of replay results (see above) for each game, in order
+
+    games is any iterable of GameRecords (e.g. GameRecord.read_records(path),
+    which streams them off disk) or (number of players, starting player,
+    history) tuples. with workers=1 there is no process pool.
+    """
+    def tasks():
+        for game in games:
+            if isinstance(game, GameRecord.GameRecord):
+                # 0 is "no winner yet", which can't be checked
+                yield (game.num_players, game.starting_player_num, game.history, game.winner or None, strict)
+            else:
+                num_players, starting_player_num, history = game
+                yield (num_players, starting_player_num, history, None, strict)
+    if workers == 1:
+        for args in tasks():
+            yield replay_game(args)
+        return
+    pool = multiprocessing.Pool(workers)
+    try:
+        for result in pool.imap(replay_game, tasks(), chunksize):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+def summarize(results, max_failures=10, verbose=True):
+    """count results by status, printing the first max_failures that aren't OK. returns {status: count}"""
+    counts = {}
+    failures = 0
+    for i, result in enumerate(results):
+        status = result['status']
+        counts[status] = counts.get(status, 0) + 1
+        if status != OK and verbose and failures < max_failures:
+            failures += 1
+            if status == ERROR:
+                print "game %d: %s" % (i, result['error'])
+            elif status == ILLEGAL:
+                print "game %d: illegal turn %s at ply %d" % (i, result['turn'], result['illegal_ply'])
+            else:
+                print "game %d: %s (won by %d)" % (i, status, result['winner'])
+    return counts
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print "usage: python BulkReplay.py <game record file> [strict] [workers]"
+        sys.exit(1)
+    args = sys.argv[2:]
+    strict = bool(args) and args[0] == "strict"
+    if strict:
+        args = args[1:]
+    workers = int(args[0]) if args else None
+    tstart = time()
+    counts = summarize(replay_all(GameRecord.read_records(sys.argv[1]), strict, workers))
+    telapsed = time() - tstart
+    total = sum(counts.values())
+    print "%d games in %.2f s (%.0f games/sec): %s" % \
+        (total, telapsed, total / telapsed if telapsed else 0.0, ", ".join("%s %d" % c for c in sorted(counts.items())))
+    sys.exit(0 if counts.get(OK, 0) == total else 1)
@@ -0,0 +1,142 @@
+from collections import deque
+import heapq
+
+class DistanceField:
+    """Number of steps from every node of a graph to the nearest of a set of goal nodes
+
+    Built once with a multi-source breadth-first search out of the goals (edges
+    are undirected, so this is also the distance *to* the goals). After that it
+    is repaired in place whenever a single edge is removed from or added back to
+    the graph, touching only the nodes whose distance actually changes.
+
+    distance(node) is None if no goal can be reached from node.
+    """
+
+    def __init__(self, graph, goals, field_in=None):
+        self.graph = graph
+        self.goals = set(goals)
+        if field_in:
+            self.dist = dict(field_in.dist)
+        else:
+            self.recompute()
+
+    def duplicate(self, graph):
+        """copy of this field, kept up to date against the given (copied) graph"""
+        return DistanceField(graph, self.goals, field_in=self)
+
+    def recompute(self):
+        """full multi-source BFS from all goals"""
+        dist = {}
+        queue = deque()
+        for g in self.goals:
+            dist[g] = 0
+            queue.append(g)
+        while queue:
+            node = queue.popleft()
+            next_dist = dist[node] + 1
+            for adj in self.graph.get_adj_nodes(node):
+                if adj not in dist:
+                    dist[adj] = next_dist
+                    queue.append(adj)
+        self.dist = dist
+
+    def distance(self, node):
+        return self.dist.get(node)
+
+    def path_from(self, node):
+        """a shortest path from node to a goal (list of nodes, node first), or None"""
+        d = self.dist.get(node)
+        if d is None:
+            return None
+        dist = self.dist
+        path = [node]
+        while d > 0:
+            for adj in self.graph.get_adj_nodes(node):
+                if dist.get(adj) == d-1:
+                    node = adj
+                    break
+            path.append(node)
+            d -= 1
+        return path
+
+    #####################
+    ## repair on edits ##
+    #####################
+
+    def edge_removed(self, edge):
+        """update after edge (node1, node2[, weight]) was removed from the graph"""
+        node1, node2 = edge[0], edge[1]
+        d1, d2 = self.dist.get(node1), self.dist.get(node2)
+        if d1 is None or d2 is None or d1 == d2:
+            # edge could not have been on any shortest path
+            return
+        # only the endpoint farther from the goals may have depended on this edge
+        far = node1 if d1 > d2 else node2
+        if self._supported(far, set()):
+            return
+
+        # find every node that lost all of its shortest-path neighbors.
+        #   nodes are visited level by level, so when a node is checked all
+        #   nodes one step closer to the goals have already been classified
+        dist = self.dist
+        affected = set([far])
+        queue = deque([far])
+        while queue:
+            node = queue.popleft()
+            child_dist = dist[node] + 1
+            for adj in self.graph.get_adj_nodes(node):
+                if adj not in affected and dist.get(adj) == child_dist and not self._supported(adj, affected):
+                    affected.add(adj)
+                    queue.append(adj)
+
+        # affected nodes get new distances through their unaffected neighbors.
+        #   dijkstra on the affected region only, seeded from its boundary
+        heap = []
+        for node in affected:
+            del dist[node]
+        for node in affected:
+            best = None
+            for adj in self.graph.get_adj_nodes(node):
+                d = dist.get(adj)
+                if d is not None and (best is None or d+1 < best):
+                    best = d+1
+            if best is not None:
+                heapq.heappush(heap, (best, node))
+        while heap:
+            d, node = heapq.heappop(heap)
+            if node in dist:
+                continue
+            dist[node] = d
+            for adj in self.graph.get_adj_nodes(node):
+                if adj in affected and adj not in dist:
+                    heapq.heappush(heap, (d+1, adj))
+
+    def edge_added(self, edge):
+        """update after edge (node1, node2[, weight]) was added to the graph"""
+        node1, node2 = edge[0], edge[1]
+        dist = self.dist
+        queue = deque()
+        for a, b in [(node1, node2), (node2, node1)]:
+            da, db = dist.get(a), dist.get(b)
+            if da is not None and (db is None or db > da+1):
+                dist[b] = da+1
+                queue.append(b)
+        # spread the shortcut to everything that is now closer
+        while queue:
+            node = queue.popleft()
+            next_dist = dist[node] + 1
+            for adj in self.graph.get_adj_nodes(node):
+                d = dist.get(adj)
+                if d is None or d > next_dist:
+                    dist[adj] = next_dist
+                    queue.append(adj)
+
+    def _supported(self, node, affected):
+        """True if node is a goal or still has a neighbor one step closer to the goals"""
+        if node in self.goals:
+            return True
+        want = self.dist[node] - 1
+        for adj in self.graph.get_adj_nodes(node):
+            if adj not in affected and self.dist.get(adj) == want:
+                return True
+        return False
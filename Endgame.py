@@ -0,0 +1,165 @@
+# Exact endgame solver for 2-player pawn races.
+#   Once nobody can place a wall the board is fixed and the game is a race
+#   between 2 pawns: a position is just (square of player 0, square of
+#   player 1, whose turn). That's 81*81*2 positions, few enough to solve all
+#   of them by retrograde analysis - work backwards from the positions where
+#   someone has won - with the same move and jump rules as the game.
+#
+#   It also applies when only the side to move has walls left: if the pure
+#   race is already won, walls aren't needed and the other side can't place any.
+
+from collections import deque
+import Helpers as h
+from Playout import square, point, pawn_moves, distances, WALL_INDEX, WALL_DOWN, WALL_RIGHT, DOWN_MASK, RIGHT_MASK
+
+WIN = 1
+LOSS = -1
+# neither side can force a win (both can keep dodging forever)
+DRAW = 0
+RESULT_NAMES = {WIN: "win", LOSS: "loss", DRAW: "draw"}
+
+class EndgameTable:
+    """Win/loss/draw and distance to the end for every 2-pawn position on a fixed board
+
+    positions are (a, b, turn): a and b are the squares of player 0 and 1
+    (see Playout.square), turn is the index of the player to move. Results are
+    for the player to move; depth is the number of plies until the game ends
+    with best play (fastest win, slowest loss).
+    """
+
+    def __init__(self, down_open, right_open, goal_masks):
+        self.down_open = down_open
+        self.right_open = right_open
+        self.goal_masks = goal_masks
+        # to break ties between equally good moves: head for goal anyway
+        self.dists = [distances(g, down_open, right_open) for g in goal_masks]
+        self.solve()
+
+    def index(self, a, b, turn):
+        return (a * h.NUM_SQUARES + b) * 2 + turn
+
+    def successors(self, a, b, turn):
+        """positions after each legal move: list of (move square, position index)"""
+        if turn == 0:
+            return [(m, self.index(m, b, 1)) for m in pawn_moves(a, [b], self.down_open, self.right_open)]
+        return [(m, self.index(a, m, 0)) for m in pawn_moves(b, [a], self.down_open, self.right_open)]
+
+    def is_over(self, a, b, turn):
+        """True if the player who just moved (not turn) has reached a goal"""
+        if turn == 0:
+            return bool((self.goal_masks[1] >> b) & 1)
+        return bool((self.goal_masks[0] >> a) & 1)
+
+    def solve(self):
+        n = h.NUM_SQUARES
+        size = n * n * 2
+        self.result = [DRAW] * size
+        self.depth = [None] * size
+        predecessors = [[] for i in range(size)]
+        # successors not yet known to win for the opponent
+        unresolved = [0] * size
+        queue = deque()
+        for a in range(n):
+            for b in range(n):
+                if a == b:
+                    continue
+                for turn in (0, 1):
+                    i = self.index(a, b, turn)
+                    if self.is_over(a, b, turn):
+                        self.result[i] = LOSS
+                        self.depth[i] = 0
+                        queue.append(i)
+                        continue
+                    succ = self.successors(a, b, turn)
+                    unresolved[i] = len(succ)
+                    for m, j in succ:
+                        predecessors[j].append(i)
+        # positions come off the queue in order of depth, so the first win
+        #   found is the fastest and the last successor to resolve a loss is the slowest
+        result, depth = self.result, self.depth
+        while queue:
+            j = queue.popleft()
+            for i in predecessors[j]:
+                if depth[i] is not None:
+                    continue
+                if result[j] == LOSS:
+                    result[i] = WIN
+                    depth[i] = depth[j] + 1
+                    queue.append(i)
+                else:
+                    unresolved[i] -= 1
+                    if unresolved[i] == 0:
+                        result[i] = LOSS
+                        depth[i] = depth[j] + 1
+                        queue.append(i)
+
+    def value(self, a, b, turn):
+        """(result, depth) for the player to move"""
+        i = self.index(a, b, turn)
+        return self.result[i], self.depth[i]
+
+    def best_move(self, a, b, turn):
+        """square to move to: fastest win, else a draw, else slowest loss. None if no moves
+
+        among equally good moves, the one closest to goal (in case the opponent slips up)
+        """
+        best, best_key = None, None
+        dist = self.dists[turn]
+        for m, j in self.successors(a, b, turn):
+            # result/depth of the successor are for the opponent
+            result, depth = self.result[j], self.depth[j]
+            if result == LOSS:
+                key = (2, -depth, -dist[m])
+            elif result == DRAW:
+                key = (1, 0, -dist[m])
+            else:
+                key = (0, depth, -dist[m])
+            if best_key is None or key > best_key:
+                best, best_key = m, key
+        return best
+
+# tables already solved, by board (walls never change once all are used, so
+#   every turn of the same endgame hits the cache)
+_tables = {}
+MAX_CACHED_TABLES = 8
+
+def get_table(game_state):
+    down_open, right_open = DOWN_MASK, RIGHT_MASK
+    for w in game_state.walls:
+        i = WALL_INDEX[w]
+        down_open &= ~WALL_DOWN[i]
+        right_open &= ~WALL_RIGHT[i]
+    goal_masks = tuple(sum(1 << square(g) for g in p.goal_positions) for p in game_state.players)
+    key = (down_open, right_open, goal_masks)
+    table = _tables.get(key)
+    if table is None:
+        if len(_tables) >= MAX_CACHED_TABLES:
+            _tables.clear()
+        table = _tables[key] = EndgameTable(down_open, right_open, goal_masks)
+    return table
+
+def applies(game_state):
+    """True if the position can be solved as a pure race (2 players, only the mover may have walls)"""
+    if len(game_state.players) != 2:
+        return False
+    return all(p.num_walls == 0 for p in game_state.other_players)
+
+def solve(game_state):
+    """return (move, result, depth) for the player to move, or None if not solvable
+
+    move is a turn string; result is WIN, LOSS or DRAW for the player to move
+    and depth is plies to the end (None for a draw). If the mover still has
+    walls, only a won race is returned (otherwise walls might do better).
+    """
+    if not applies(game_state):
+        return None
+    table = get_table(game_state)
+    a, b = [square(p.position) for p in game_state.players]
+    turn = game_state.players.index(game_state.current_player)
+    result, depth = table.value(a, b, turn)
+    if game_state.current_player.num_walls and result != WIN:
+        return None
+    m = table.best_move(a, b, turn)
+    if m is None:
+        return None
+    return h.point_to_notation(point(m)), result, depth
@@ -0,0 +1,48 @@
+from collections import OrderedDict
+
+class EvalCache:
+    """Memoizes a score function score_func(game_state, player) by position
+
+    Entries are keyed by (game_state.hash, index of player) (see Zobrist.py),
+    so any score function that depends only on the position works. Holds at
+    most size entries; when full, the least recently used one is dropped.
+
+    Call it just like the score function it wraps.
+    """
+
+    DEFAULT_SIZE = 100000
+
+    def __init__(self, score_func, size=DEFAULT_SIZE):
+        self.score_func = score_func
+        self.size = size
+        self.clear()
+
+    def clear(self):
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, game_state, player):
+        key = (game_state.hash, game_state.players.index(player))
+        entries = self.entries
+        score = entries.pop(key, None)
+        if score is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            score = self.score_func(game_state, player)
+            if len(entries) >= self.size:
+                entries.popitem(last=False)
+        # (re)insert as most recently used
+        entries[key] = score
+        return score
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit-rate': self.hit_rate(),
+                'entries': len(self.entries)}
@@ -2,10 +2,11 @@
 # Modules for player, graph, interaction, graphics, or AI done separately.
 
 import SpecialGraphs
-from Graph import Graph
+from DistanceField import DistanceField
 from Player import Player
 import string
 import Helpers as h
+import Zobrist
 import random
 from TreeAI import TreeAI
 from pprint import pprint 
@@ -56,8 +57,11 @@ class Game:
         for both of these, the point "A" will be used to denote the wall's location
         
     """
+
+    # entries kept in blocking_walls_cache before it is emptied
+    BLOCKING_CACHE_SIZE = 4096
     
-    def __init__(self, num_players=2, num_ai=0, duplicate=False):
+    def __init__(self, num_players=2, num_ai=0, duplicate=False, backend="graph", starting_player_num=None):
         # undo/redo as list of turn strings
         self.history             = []
         self.redo_history        = []
@@ -67,12 +71,31 @@ class Game:
         self.current_player_num  = 1
         self.current_player      = None
         self.other_players       = None
-        # special graph for grid
+        # special graph for grid (backend: a key of SpecialGraphs.BOARD_BACKENDS)
+        self.backend             = backend
         self.graph               = None
+        # distance from every square to each player's goal (same order as players)
+        self.distance_fields     = []
         # initially no walls
         self.walls               = []
         self.legal_moves         = []
         self.legal_walls         = []
+        # number of placed walls overlapping or crossing each wall (0 means it fits)
+        self.wall_conflict_counts = None
+        # legal_walls before each turn in history, so undo can put them back
+        #   (None where they weren't kept up to date: see execute_turn)
+        self.legal_walls_history = []
+        # False after turns executed without verify_legal: legal_walls is stale
+        self.legal_walls_current = True
+        # zobrist hash of the placed walls alone. keys the cache of path-blocking walls
+        self.walls_key           = 0
+        # (player index, position, walls_key) -> walls that would cut the player off.
+        #   duplicate() gives the copy its own dict, starting with these entries
+        self.blocking_walls_cache = {}
+        # zobrist hash of the position (see Zobrist.py), kept up to date by
+        #   add_wall, remove_wall, do_move, undo_move, set_num_walls,
+        #   next_player and prev_player
+        self.hash                = 0
         
         if not duplicate:
             # players: 2 or 4
@@ -85,13 +108,17 @@ class Game:
             if num_ai > num_players:
                 raise QuoridorException("cannot have more ai than players")
             
-            self.graph = SpecialGraphs.GraphNet(9,9)
+            self.graph = SpecialGraphs.BoardNet(9, 9, backend)
+            self.wall_conflict_counts = dict((w, 0) for w in h.all_walls())
+            self.distance_fields = [DistanceField(self.graph, p.goal_positions) for p in self.players]
             
-            cpn = random.randint(1,num_players)
-            #self.starting_player_num = cpn # never forget who started!
+            # random first player unless told who starts
+            cpn = starting_player_num or random.randint(1,num_players)
+            self.starting_player_num = cpn # never forget who started!
             self.current_player_num = cpn
             self.current_player = self.players[cpn-1]
             self.other_players = [p for p in self.players if p != self.current_player]
+            self.hash = Zobrist.hash_game(self)
             all_inds = range(len(self.players))
             while num_ai > 0:
                 ai_player = random.choice(all_inds)
@@ -103,21 +130,29 @@ class Game:
     def duplicate(self):
         # make new game with same state as self
         #   this copy game should be passed to AI n' stuff so they can't actually do any damage
-        new_gs = Game(len(self.players), duplicate=True)
+        new_gs = Game(len(self.players), duplicate=True, backend=self.backend)
         
         new_gs.history             = h.list_copy(self.history)
         new_gs.redo_history        = h.list_copy(self.redo_history)
         new_gs.players             = [p.duplicate() for p in self.players]
-        #new_gs.starting_player_num = self.starting_player_num
+        new_gs.starting_player_num = self.starting_player_num
         new_gs.current_player_num  = self.current_player_num
         new_gs.current_player      = new_gs.players[new_gs.current_player_num-1]
         new_gs.other_players       = [p for p in new_gs.players if p != new_gs.current_player]
         # special graph for grid
-        new_gs.graph               = Graph(graph_in = self.graph)
+        new_gs.graph               = self.graph.duplicate()
+        new_gs.distance_fields     = [f.duplicate(new_gs.graph) for f in self.distance_fields]
         # initially no walls
         new_gs.walls               = h.list_copy(self.walls)
         new_gs.legal_moves         = h.list_copy(self.legal_moves)
         new_gs.legal_walls         = h.list_copy(self.legal_walls)
+        new_gs.wall_conflict_counts = dict(self.wall_conflict_counts)
+        new_gs.legal_walls_history = h.list_copy(self.legal_walls_history)
+        new_gs.legal_walls_current = self.legal_walls_current
+        new_gs.walls_key           = self.walls_key
+        # entries are never changed once made, so copying the dict is enough
+        new_gs.blocking_walls_cache = dict(self.blocking_walls_cache)
+        new_gs.hash                = self.hash
         
         return new_gs
 
@@ -126,8 +161,10 @@ class Game:
         
         includes both num and reference to current player object
         """
+        self.hash ^= Zobrist.side_key(self.current_player_num)
         self.current_player_num %= len(self.players)
         self.current_player_num += 1
+        self.hash ^= Zobrist.side_key(self.current_player_num)
         self.current_player = self.get_player_by_num(self.current_player_num)
         self.other_players = [p for p in self.players]
         self.other_players.remove(self.current_player)
@@ -135,9 +172,11 @@ class Game:
         #print "current player position:", self.current_player.position
     
     def prev_player(self):
+        self.hash ^= Zobrist.side_key(self.current_player_num)
         self.current_player_num -= 1
         if self.current_player_num == 0:
             self.current_player_num = len(self.players)
+        self.hash ^= Zobrist.side_key(self.current_player_num)
         self.current_player = self.get_player_by_num(self.current_player_num)
         self.other_players = [p for p in self.players]
         self.other_players.remove(self.current_player)
@@ -168,7 +207,7 @@ class Game:
             if w_valid:
                 #print "\twalled successfully"
                 self.add_wall(turn_string)
-                self.current_player.use_wall()
+                self.use_wall(self.current_player)
             elif m_valid:
                 #print "\tmoved successfully"
                 self.do_move(turn_string)
@@ -182,7 +221,7 @@ class Game:
                 self.do_move(turn_string)
             elif len(turn_string) == 3:
                 self.add_wall(turn_string)
-                self.current_player.use_wall()
+                self.use_wall(self.current_player)
         
         # check for win
         if self.current_player.position in self.current_player.goal_positions:
@@ -195,9 +234,13 @@ class Game:
             #   if not verify, don't update.
             player_just_moved = self.current_player
             self.history.append(turn_string)
+            self.legal_walls_history.append(self.legal_walls if self.legal_walls_current else None)
             self.next_player()
             if verify_legal:
-                self.update_all([player_just_moved])
+                # a wall can change everyone's shortest path, a move only the mover's
+                self.update_all(self.players if len(turn_string) == 3 else [player_just_moved])
+            else:
+                self.legal_walls_current = False
             return 1
     
     def undo(self):
@@ -206,14 +249,83 @@ class Game:
             turn = self.history.pop()
             self.redo_history.append(turn)
             if len(turn) == 2:
-                self.current_player.pop_location()
+                self.undo_move(self.current_player)
                 self.update_shortest_path(self.current_player)
             elif len(turn) == 3:
                 self.remove_wall(turn)
-                self.current_player.num_walls += 1
+                self.set_num_walls(self.current_player, self.current_player.num_walls + 1)
+                for p in self.players:
+                    self.update_shortest_path(p)
             self.update_legal_moves()
-            self.update_legal_walls()
+            legal_walls = self.legal_walls_history.pop() if self.legal_walls_history else None
+            if legal_walls is not None:
+                self.legal_walls = legal_walls
+                self.legal_walls_current = True
+            else:
+                self.update_legal_walls()
     
+    def make_turn(self, turn_string, update_legal=True):
+        """play a turn in place, for search. returns a record for unmake_turn()
+
+        Turn must be legal - no checks performed here. Unlike execute_turn,
+        this doesn't touch redo history, and a winning turn still passes play
+        to the next player (check get_winner() to see if the game is over).
+        With update_legal=False the legal moves/walls are left empty instead of
+        recomputed (for leaves of a search, which are only evaluated).
+
+        The record captures exactly what changed, so that unmaking is cheap:
+            (turn code, mover's walls before, each player's available points
+             and shortest path before, legal moves before, legal_walls_current)
+        legal walls before are kept on legal_walls_history, as with undo().
+        """
+        player = self.current_player
+        code = h.turn_to_code(turn_string)
+        record = (code, player.num_walls, [p.available_points for p in self.players],
+                  [p.shortest_path for p in self.players], self.legal_moves, self.legal_walls_current)
+        is_wall = code >= h.NUM_SQUARES
+        if is_wall:
+            self.add_wall(turn_string)
+            self.use_wall(player)
+        else:
+            self.do_move(turn_string)
+        self.history.append(turn_string)
+        self.legal_walls_history.append(self.legal_walls)
+        self.next_player()
+        if update_legal and self.get_winner() is None:
+            self.update_all(self.players if is_wall else [player])
+        else:
+            # game over (or caller doesn't need them): nothing left to play
+            self.legal_moves = []
+            self.legal_walls = []
+            for p in (self.players if is_wall else [player]):
+                self.update_shortest_path(p)
+        return record
+
+    def unmake_turn(self, record):
+        """take back the last turn played by make_turn(), given its record"""
+        code, num_walls, available_points, shortest_paths, legal_moves, legal_walls_current = record
+        self.prev_player()
+        player = self.current_player
+        turn = self.history.pop()
+        if code >= h.NUM_SQUARES:
+            self.remove_wall(turn)
+        else:
+            self.undo_move(player)
+        self.set_num_walls(player, num_walls)
+        for p, ap, sp in zip(self.players, available_points, shortest_paths):
+            p.available_points = ap
+            p.shortest_path = sp
+        self.legal_moves = legal_moves
+        self.legal_walls = self.legal_walls_history.pop()
+        self.legal_walls_current = legal_walls_current
+
+    def get_winner(self):
+        """player who has reached one of their goals, or None"""
+        for p in self.players:
+            if p.position in p.goal_positions:
+                return p
+        return None
+
     def redo(self):
         if len(self.redo_history) > 0:
             self.execute_turn(self.redo_history.pop(), True)
@@ -224,9 +336,14 @@ class Game:
         must run is_valid check first - no checks preformed here
         """
         self.walls.append(wall_string)
-        edge1, edge2 = h.wall_string_to_edges(wall_string)
-        self.graph.removeEdge(edge1, directed=False)
-        self.graph.removeEdge(edge2, directed=False)
+        self.hash ^= Zobrist.WALL_KEYS[wall_string]
+        for w in h.WALL_CONFLICTS[wall_string]:
+            self.wall_conflict_counts[w] += 1
+        self.walls_key ^= Zobrist.WALL_KEYS[wall_string]
+        for edge in h.wall_string_to_edges(wall_string):
+            self.graph.removeEdge(edge, directed=False)
+            for field in self.distance_fields:
+                field.edge_removed(edge)
         if playernum:
             p = self.get_player_by_num(playernum)
         
@@ -234,41 +351,57 @@ class Game:
         # same as add_wall function but adds in edges where adding walls
         #   removes edges
         self.walls.pop()
-        edge1, edge2 = h.wall_string_to_edges(wall_string)
-        self.graph.addEdge(edge1, directed=False)
-        self.graph.addEdge(edge2, directed=False)
+        self.hash ^= Zobrist.WALL_KEYS[wall_string]
+        for w in h.WALL_CONFLICTS[wall_string]:
+            self.wall_conflict_counts[w] -= 1
+        self.walls_key ^= Zobrist.WALL_KEYS[wall_string]
+        for edge in h.wall_string_to_edges(wall_string):
+            self.graph.addEdge(edge, directed=False)
+            for field in self.distance_fields:
+                field.edge_added(edge)
                 
     def do_move(self, move_string):
-        self.current_player.push_location(h.notation_to_point(move_string))
+        player = self.current_player
+        i = self.players.index(player)
+        new_pos = h.notation_to_point(move_string)
+        self.hash ^= Zobrist.pawn_key(i, player.position) ^ Zobrist.pawn_key(i, new_pos)
+        player.push_location(new_pos)
+
+    def undo_move(self, player):
+        # player goes back to where they were before their last move
+        i = self.players.index(player)
+        self.hash ^= Zobrist.pawn_key(i, player.position)
+        player.pop_location()
+        self.hash ^= Zobrist.pawn_key(i, player.position)
+
+    def use_wall(self, player):
+        self.set_num_walls(player, player.num_walls - 1)
+
+    def set_num_walls(self, player, num_walls):
+        i = self.players.index(player)
+        self.hash ^= Zobrist.walls_left_key(i, player.num_walls) ^ Zobrist.walls_left_key(i, num_walls)
+        player.num_walls = num_walls
 
     def get_shortest_path(self, start, end):
         return self.graph.findPathBreadthFirst(start, end)
 
+    def get_distance_field(self, player):
+        return self.distance_fields[self.players.index(player)]
+
+    def get_path_length(self, player):
+        """number of steps from player to its nearest goal (None if cut off)"""
+        return self.get_distance_field(player).distance(player.position)
+
     def get_shortest_path_player(self, player, force_recalc=False):
         p = player
         if force_recalc or not p.shortest_path:
-            if len(self.walls) == 0:
-                return self.graph.findPathDepthFirst(p.position, p.goal_positions, p.sortfunc)
-            else:
-                bfs_tree = self.graph.build_BFS_tree(p.position, p.goal_positions)
-                #print "------------------------"
-                #print "from "+str(p.position)+" to "+str(p.goal_positions)
-                #pprint(bfs_tree)
-                paths = [self.graph.pathFromBFSTree(bfs_tree, p.position, g) for g in p.goal_positions]
-                #print "-Paths, pre-filter-"
-                #pprint(paths)
-                paths = [path for path in paths if path is not None]
-                #print "-Paths, post-filter-"
-                #pprint(paths)
-                #print "history:", self.history
-                #paths = sorted(paths, cmp = lambda a, b: len(a)-len(b))
-                return paths[0]
+            return self.get_distance_field(p).path_from(p.position)
         else:
             return p.shortest_path
 
     def path_exists(self, player_num):
         player = self.get_player_by_num(player_num)
-        return self.graph.findPathDepthFirst(player.position, player.goal_positions, player.sortfunc) is not None
+        return self.get_path_length(player) is not None
 
     def update_all(self, player_list=None):
         for p in player_list:
@@ -283,39 +416,77 @@ class Game:
         #print "legal moves updated to:", self.legal_moves
 
     def update_legal_walls(self):
-        all_w = h.all_walls()
-        all_w = [w for w in all_w if w not in self.walls]
-        all_w = filter(lambda w: self.wall_is_valid(w), all_w)
-        self.legal_walls = all_w
+        """rebuild legal_walls from what is kept up to date between turns
+
+        Whether a wall fits on the board (no overlap or crossing) is tracked by
+        wall_conflict_counts as walls are added and removed. Whether it would
+        cut a player off is only worked out for walls touching that player's
+        shortest path, and only for a position and set of walls not seen
+        before (see get_blocking_walls). Everything else is a set lookup.
+        """
+        self.legal_walls_current = True
+        if self.current_player.num_walls == 0:
+            self.legal_walls = []
+            return
+        blocking = set()
+        for p in self.players:
+            blocking |= self.get_blocking_walls(p)
+        counts = self.wall_conflict_counts
+        self.legal_walls = [w for w in h.all_walls() if counts[w] == 0 and w not in blocking]
         #print "legal walls updated to:", self.legal_walls
+
+    def get_blocking_walls(self, player):
+        """set of walls that fit on the board but would cut player off from all goals
+
+        Only walls blocking an edge of the player's shortest path can do that.
+        Of those, walls blocking an edge on every path (a critical edge) are
+        blocking without any search; the rest might still form a cut with
+        their 2 edges together, so they get a trial search.
+
+        Cached by player, position and placed walls, so taking a turn back
+        (undo, unmake_turn) finds the walls worked out before it.
+        """
+        key = (self.players.index(player), player.position, self.walls_key)
+        cached = self.blocking_walls_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        path_edges, critical_edges = self.get_path_edges(player)
+        blocking = set()
+        counts = self.wall_conflict_counts
+        for e in path_edges:
+            for w in h.EDGE_WALLS.get(e, []):
+                if counts[w] or w in blocking:
+                    continue
+                if any(we in critical_edges for we in h.WALL_EDGE_SETS[w]) or \
+                        self.wall_blocks_path(w, [player]):
+                    blocking.add(w)
+        if len(self.blocking_walls_cache) >= Game.BLOCKING_CACHE_SIZE:
+            self.blocking_walls_cache.clear()
+        self.blocking_walls_cache[key] = blocking
+        return blocking
+
+    def get_path_edges(self, player):
+        """return (edges of a shortest path, edges on every path) for player
+
+        both as sets of frozenset([point1, point2])
+        """
+        path = self.get_shortest_path_player(player, True)
+        if path is None:
+            return set(), set()
+        path_edges = set(frozenset(e) for e in zip(path[:-1], path[1:]))
+        critical_edges = self.graph.findCriticalEdges(player.position, player.goal_positions)
+        return path_edges, critical_edges
     
     def update_shortest_path(self, player):
         sp = player.shortest_path
-        recalc_path = True
-        if sp:
-            if len(sp) > 1 and player.position == sp[1]:
-                # player moved one step along shortest path.
-                #   new shortest path is same as previous, starting 1 farther along
-                player.shortest_path = sp[1:]
-                recalc_path = False
-            elif player.position == sp[0]:
-                # p hasn't moved - check if sp is still clear
-                broken = False
-                for i in range(len(sp)-1):
-                    e = (sp[i], sp[i+1], 1)
-                    if not self.graph.hasEdge(e):
-                        # path interrupted by new wall
-                        broken = True
-                        break
-                # path still clear, therefore still shortest. no change!
-                if not broken:
-                    recalc_path = False
-        
-        if recalc_path:
-            player.shortest_path = self.get_shortest_path_player(player, True)
-            h.increment_int_stat('sp-slow-updates')
+        if sp and len(sp) > 1 and player.position == sp[1]:
+            # player moved one step along shortest path.
+            #   new shortest path is same as previous, starting 1 farther along
+            player.shortest_path = sp[1:]
         else:
-            h.increment_int_stat('sp-fast-updates')
+            # walk down the distance field (one step per square, no search)
+            player.shortest_path = self.get_shortest_path_player(player, True)
 
     def turn_is_valid(self, turn_string, type=""):
         if type and type == "move":
@@ -330,10 +501,9 @@ class Game:
         other_players = self.other_players
         cur_pt = player.position
         other_pts = [p.position for p in other_players]
-        avail_pts_temp = self.graph.get_adj_nodes(cur_pt)
-        for s in avail_pts_temp:
+        avail_pts_temp = []
+        for s in self.graph.get_adj_nodes(cur_pt):
             if s in other_pts:
-                avail_pts_temp.remove(s)
                 row_from, col_from = cur_pt
                 row_to, col_to = s
                 skip_pt = (2*row_to-row_from, 2*col_to-col_from)
@@ -344,11 +514,13 @@ class Game:
                 else:
                     # create T points (diagonal movement)
                     T_point_1 = (row_to + (col_to-col_from), col_to+(row_to-row_from))
-                    if self.graph.hasEdge((s, T_point_1)):
+                    if self.graph.hasEdge((s, T_point_1)) and T_point_1 not in other_pts:
                         avail_pts_temp.append(T_point_1)
                     T_point_2 = (row_to + (col_from-col_to), col_to+(row_from-row_to))
-                    if self.graph.hasEdge((s, T_point_2)):
+                    if self.graph.hasEdge((s, T_point_2)) and T_point_2 not in other_pts:
                         avail_pts_temp.append(T_point_2)
+            else:
+                avail_pts_temp.append(s)
         player.available_points = avail_pts_temp
 
     def wall_is_valid(self, wall_string):
@@ -360,34 +532,10 @@ class Game:
             if self.current_player.num_walls == 0:
                 return False
             
-            #print "\tprocessing turn: wall"
-            wall_type = wall_string[0]
-            
-            edge1, edge2 = h.wall_string_to_edges(wall_string)
-            (r1, c1), (r2, c2) = edge1, edge2
-            topleft = (min(r1,r2), min(c1,c2))
-            
-            # not valid if not representing a 2x2 block
-            perp_char = 'H' if wall_type is 'V' else 'V'
-            if (perp_char + wall_string[1:] in self.walls):
-                # print "wall crosses another wall:", wall_string
-                return False
-                
-            # checking if both edges are in graph (are there to be removed with wall)
-            # this effectively checks 2 things:
-            #   - wall within bounds of board
-            #   - wall does not occupy same space as previous wall
-            if not (self.graph.hasEdge(edge1) and self.graph.hasEdge(edge2)):
-                # print "wall overlap or out of bounds:", wall_string
+            if not self.wall_fits(wall_string):
                 return False
             
-            # if wall cuts off all paths for either player, not valid
-            # check by adding in wall, checking paths, then removing wall
-            self.add_wall(wall_string)
-            paths = [self.path_exists(i) for i in range(len(self.players))]
-            self.remove_wall(wall_string)
-            
-            if paths != [True]*len(self.players):
+            if self.wall_blocks_path(wall_string):
                 # print "wall cuts off path:", wall_string
                 return False
             # if passed all the tests, it's valid!
@@ -396,6 +544,29 @@ class Game:
             print "exceptional problems (wall is valid):", str(e)
             return False
 
+    def wall_fits(self, wall_string):
+        """True if wall is on the board and doesn't cross or overlap another wall"""
+        # unknown walls are out of bounds. otherwise, a wall fits if no placed
+        #   wall conflicts with it (see Helpers.wall_conflicts)
+        return self.wall_conflict_counts.get(wall_string, 1) == 0
+
+    def wall_blocks_path(self, wall_string, players=None):
+        """True if placing wall would cut any player off from all of its goals
+
+        only checks the given players, if any
+        """
+        if players is None:
+            players = self.players
+        edge1, edge2 = h.wall_string_to_edges(wall_string)
+        # check by taking out the edges, checking paths, then putting them back
+        #   (graph only - no need to repair distance fields for a trial wall)
+        self.graph.removeEdge(edge1, directed=False)
+        self.graph.removeEdge(edge2, directed=False)
+        paths = [self.graph.hasPath(p.position, p.goal_positions) for p in players]
+        self.graph.addEdge(edge1, directed=False)
+        self.graph.addEdge(edge2, directed=False)
+        return paths != [True]*len(players)
+
     def replay(self, history_list, verify=True):
         for turn in history_list:
             success = self.execute_turn(turn, verify_legal=verify)
@@ -0,0 +1,247 @@
+# Game database: stored games, and an index from every position they reach
+#   to (game id, ply), for questions like "which games got here, and who won
+#   them?"
+#   A database is a directory of:
+#       games.bin       the games, in GameRecord format (see GameRecord.py)
+#       catalog.bin     per game id: offset in games.bin (uint64), winner (uint8)
+#       index-N.bin     sorted runs of position records:
+#                           hash    uint64  Zobrist hash of the position (see Zobrist.py)
+#                           game    uint32  game id
+#                           ply     uint16  plies played to reach it (0: start)
+#   Each batch of games added is indexed into a new run, so adding games never
+#   rewrites the existing index. Runs are memory-mapped and binary searched
+#   like OpeningBook, and merged into one when there get to be too many.
+#   A position that comes up more than once in a game is indexed at its first
+#   ply only, so that statistics count games.
+#
+#   usage:
+#       python GameDatabase.py add <db dir> <game record file>
+#       python GameDatabase.py query <db dir> <players> <starting player> [turn ...]
+
+import glob
+import heapq
+import mmap
+import os
+import struct
+import sys
+import GameRecord
+
+CATALOG = struct.Struct("<QB")
+RECORD = struct.Struct("<QIH")
+# merge the index runs into one when there are more than this many
+MAX_RUNS = 8
+# games indexed at a time when adding many
+BATCH_GAMES = 10000
+
+class IndexRun:
+    """one sorted, memory-mapped file of position records"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.num_records = os.fstat(self.file.fileno()).st_size / RECORD.size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def record(self, i):
+        return RECORD.unpack_from(self.data, i * RECORD.size)
+
+    def __iter__(self):
+        for i in xrange(self.num_records):
+            yield self.record(i)
+
+    def lookup(self, key):
+        """list of (game id, ply) of the records with hash key"""
+        lo, hi = 0, self.num_records
+        while lo < hi:
+            mid = (lo + hi) / 2
+            if self.record(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        found = []
+        for i in xrange(lo, self.num_records):
+            rkey, game_id, ply = self.record(i)
+            if rkey != key:
+                break
+            found.append((game_id, ply))
+        return found
+
+def write_run(path, records):
+    """write sorted records (an iterable of (hash, game id, ply)) to path. returns how many"""
+    n = 0
+    # write under another name and rename, so a crash never leaves half a run
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        for r in records:
+            f.write(RECORD.pack(*r))
+            n += 1
+    os.rename(tmp_path, path)
+    return n
+
+def position_hashes(game):
+    """(hash, ply) for each position of a GameRecord, from the start on, first occurrence only"""
+    from Game import Game
+    game_state = Game(game.num_players, starting_player_num=game.starting_player_num)
+    seen = set([game_state.hash])
+    hashes = [(game_state.hash, 0)]
+    for ply, turn in enumerate(game.history):
+        # only the hash is needed: don't work out legal moves/walls
+        game_state.make_turn(turn, update_legal=False)
+        if game_state.hash not in seen:
+            seen.add(game_state.hash)
+            hashes.append((game_state.hash, ply+1))
+    return hashes
+
+class GameDatabase:
+    """games and their position index, in directory path (created if need be)"""
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.games_path = os.path.join(path, "games.bin")
+        self.catalog_path = os.path.join(path, "catalog.bin")
+        # create the game files (appending nothing) if they're not there yet
+        GameRecord.GameRecordWriter(self.games_path).close()
+        open(self.catalog_path, "ab").close()
+        self.runs = []
+        self.open_index()
+
+    def open_index(self):
+        for run in self.runs:
+            run.close()
+        self.runs = [IndexRun(p) for p in sorted(glob.glob(os.path.join(self.path, "index-*.bin")))
+                     if os.path.getsize(p) > 0]
+        with open(self.catalog_path, "rb") as f:
+            self.catalog = f.read()
+
+    def close(self):
+        for run in self.runs:
+            run.close()
+        self.runs = []
+
+    def __len__(self):
+        return len(self.catalog) / CATALOG.size
+
+    def add_games(self, games):
+        """store and index games (GameRecords or Games, any iterable). returns their game ids
+
+        every BATCH_GAMES games make a new index run, so that memory use
+        stays bounded however many games are added
+        """
+        ids = []
+        batch = []
+        for game in games:
+            if not isinstance(game, GameRecord.GameRecord):
+                game = GameRecord.GameRecord.from_game(game)
+            batch.append(game)
+            if len(batch) == BATCH_GAMES:
+                ids.extend(self.add_batch(batch))
+                batch = []
+        if batch:
+            ids.extend(self.add_batch(batch))
+        return ids
+
+    def add_batch(self, games):
+        first_id = len(self)
+        records = []
+        catalog = []
+        with GameRecord.GameRecordWriter(self.games_path) as writer:
+            offset = os.fstat(writer.file.fileno()).st_size
+            for i, game in enumerate(games):
+                data = game.pack()
+                writer.file.write(data)
+                catalog.append(CATALOG.pack(offset, game.winner))
+                offset += len(data)
+                for key, ply in position_hashes(game):
+                    records.append((key, first_id + i, ply))
+        # catalog before index: if interrupted in between, the games are
+        #   stored but not found by lookups (rather than index entries left
+        #   pointing at game ids that get reused)
+        with open(self.catalog_path, "ab") as f:
+            f.write("".join(catalog))
+        records.sort()
+        runs = glob.glob(os.path.join(self.path, "index-*.bin"))
+        next_run = max([int(os.path.basename(p)[6:-4]) for p in runs] or [-1]) + 1
+        write_run(os.path.join(self.path, "index-%06d.bin" % next_run), records)
+        self.open_index()
+        if len(self.runs) > MAX_RUNS:
+            self.merge_index()
+        return range(first_id, first_id + len(catalog))
+
+    def add_game(self, game):
+        return self.add_games([game])[0]
+
+    def merge_index(self):
+        """merge all index runs into one"""
+        old_paths = [run.path for run in self.runs]
+        if len(old_paths) < 2:
+            return
+        merged_path = os.path.join(self.path, "index-%06d.bin" % (int(os.path.basename(old_paths[-1])[6:-4]) + 1))
+        write_run(merged_path, heapq.merge(*self.runs))
+        self.close()
+        for p in old_paths:
+            os.remove(p)
+        self.open_index()
+
+    def game(self, game_id):
+        """the GameRecord of a game id"""
+        offset, winner = CATALOG.unpack_from(self.catalog, game_id * CATALOG.size)
+        with open(self.games_path, "rb") as f:
+            f.seek(offset)
+            return GameRecord.read_record(f)
+
+    def winner(self, game_id):
+        """player number who won a game, or 0 if no one did"""
+        return CATALOG.unpack_from(self.catalog, game_id * CATALOG.size)[1]
+
+    def lookup(self, key):
+        """list of (game id, ply) for the games that reached the position with hash key (or a Game)"""
+        if not isinstance(key, (int, long)):
+            key = key.hash
+        found = []
+        for run in self.runs:
+            found.extend(run.lookup(key))
+        found.sort()
+        return found
+
+    def stats(self, key):
+        """how the games that reached a position (hash or Game) ended
+
+        returns {'games': count, 'wins': {player number: count}, 'draws': count}
+        (draws: games no one won)
+        """
+        found = self.lookup(key)
+        wins = {}
+        draws = 0
+        for game_id, ply in found:
+            winner = self.winner(game_id)
+            if winner:
+                wins[winner] = wins.get(winner, 0) + 1
+            else:
+                draws += 1
+        return {'games': len(found), 'wins': wins, 'draws': draws}
+
+if __name__ == "__main__":
+    from time import time
+    if len(sys.argv) < 3 or sys.argv[1] not in ("add", "query") or \
+            (sys.argv[1] == "add" and len(sys.argv) != 4) or (sys.argv[1] == "query" and len(sys.argv) < 5):
+        print "usage: python GameDatabase.py add <db dir> <game record file>"
+        print "       python GameDatabase.py query <db dir> <players> <starting player> [turn ...]"
+        sys.exit(1)
+    db = GameDatabase(sys.argv[2])
+    tstart = time()
+    if sys.argv[1] == "add":
+        ids = db.add_games(GameRecord.read_records(sys.argv[3]))
+        print "added %d games in %.2f s (%d in database)" % (len(ids), time()-tstart, len(db))
+    else:
+        from Game import Game
+        game_state = Game(int(sys.argv[3]), starting_player_num=int(sys.argv[4]))
+        for turn in sys.argv[5:]:
+            game_state.make_turn(turn, update_legal=False)
+        print db.stats(game_state)
+        print "(%.1f ms)" % (1000 * (time()-tstart))
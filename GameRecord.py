@@ -0,0 +1,132 @@
+# Compact binary game records, for storing lots of self-play games.
+#   A file is a magic string, then games one after another. Each game is a
+#   fixed-size header and then one byte per turn (the turn code, see
+#   Helpers.turn_to_code - 81 squares and 128 walls fit in a byte):
+#       num_players     uint8
+#       starting player uint8   player number, 1-based
+#       winner          uint8   player number, or 0 if no one won (unfinished/draw)
+#       reserved        uint8
+#       seed            uint32  random seed the game was played with, if any
+#       num_plies       uint16
+#   Games are only ever appended, so a writer can add finished games to a
+#   file as they come in. read_records is a generator: it holds one game in
+#   memory at a time however big the file is.
+
+import os
+import struct
+import Helpers as h
+
+MAGIC = "QGAMES01"
+HEADER = struct.Struct("<BBBBIH")
+MAX_PLIES = 0xFFFF
+
+class GameRecord:
+    """one game: who played, who started, the turns, who won"""
+
+    def __init__(self, num_players, starting_player_num, history, winner=0, seed=0):
+        self.num_players = num_players
+        self.starting_player_num = starting_player_num
+        self.history = list(history)
+        self.winner = winner
+        self.seed = seed
+
+    @staticmethod
+    def from_game(game_state, seed=0):
+        winner = game_state.get_winner()
+        history = list(game_state.history)
+        if winner and winner is game_state.current_player:
+            # Game.execute_turn doesn't put the winning move in the history
+            #   (nor pass the turn on): it's the winner's square
+            history.append(h.point_to_notation(winner.position))
+        return GameRecord(len(game_state.players), game_state.starting_player_num, history,
+                          game_state.players.index(winner) + 1 if winner else 0, seed)
+
+    def to_game(self, verify=True, backend="graph"):
+        """replay the game. returns the Game, or None if verify is on and a turn was illegal"""
+        from Game import Game
+        game_state = Game(self.num_players, backend=backend, starting_player_num=self.starting_player_num)
+        for turn in self.history:
+            if game_state.execute_turn(turn, verify_legal=verify) <= 0:
+                return None
+        return game_state
+
+    def pack(self):
+        if len(self.history) > MAX_PLIES:
+            raise ValueError("game too long to record: %d plies" % len(self.history))
+        codes = bytearray(h.turn_to_code(t) for t in self.history)
+        return HEADER.pack(self.num_players, self.starting_player_num, self.winner, 0,
+                           self.seed & 0xFFFFFFFF, len(codes)) + str(codes)
+
+    def __eq__(self, other):
+        return isinstance(other, GameRecord) and self.__dict__ == other.__dict__
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "GameRecord(%d, %d, %r, winner=%d, seed=%d)" % \
+            (self.num_players, self.starting_player_num, self.history, self.winner, self.seed)
+
+class GameRecordWriter:
+    """appends games to a record file (created if need be)
+
+    each write() goes to the file right away (flushed), so games
+    written before a crash are kept
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "ab")
+        if os.fstat(self.file.fileno()).st_size == 0:
+            self.file.write(MAGIC)
+        self.count = 0
+
+    def write(self, game):
+        """add a game: a GameRecord, or a Game (recorded with seed 0)"""
+        if not isinstance(game, GameRecord):
+            game = GameRecord.from_game(game)
+        self.file.write(game.pack())
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def read_record(f):
+    """the GameRecord at the current position of open file f, or None at the end of the file
+
+    a game cut short at the end of the file (its writer died mid-write) counts as the end
+    """
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    num_players, first, winner, reserved, seed, num_plies = HEADER.unpack(header)
+    codes = f.read(num_plies)
+    if len(codes) < num_plies:
+        return None
+    turn_strings = h.TURN_STRINGS
+    return GameRecord(num_players, first, [turn_strings[c] for c in bytearray(codes)], winner, seed)
+
+def read_records(path):
+    """generator of the GameRecords in a file, in the order they were written"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("not a game record file: %s" % path)
+        while True:
+            record = read_record(f)
+            if record is None:
+                return
+            yield record
+
+def write_records(path, records):
+    """append every record (or Game) of an iterable. returns how many were written"""
+    with GameRecordWriter(path) as writer:
+        for r in records:
+            writer.write(r)
+        return writer.count
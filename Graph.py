@@ -51,6 +51,9 @@ class Graph:
         
     def __repr__(self):
         return repr(self.graph_dict)
+    
+    def duplicate(self):
+        return Graph(graph_in=self)
                 
     def addEdge(self, e, directed=True):
         """Add edge to graph.
@@ -176,6 +179,17 @@ class Graph:
         
         return path        
     
+    # True if any of goalnodes can be reached from startnode
+    def hasPath(self, startnode, goalnodes):
+        parents, distances, found = self.build_BFS_parents(startnode, goalnodes)
+        return found is not None
+    
+    # shortest path from startnode to whichever of goalnodes is closest
+    # returns path as list of nodes, or None if no goal is reachable
+    def findShortestPath(self, startnode, goalnodes):
+        parents, distances, found = self.build_BFS_parents(startnode, goalnodes)
+        return self.pathFromBFSParents(parents, found)
+    
     # breadth-first search: use Queue of next items
     # returns path as list of nodes
     def findPathBreadthFirst(self, startnode, goalnode):
@@ -185,67 +199,143 @@ class Graph:
         if not self.hasNode(goalnode):
             raise NodeNotExistError(goalnode)
     
-        bfs_tree = self.build_BFS_tree(startnode)
-        return self.pathFromBFSTree(bfs_tree, startnode, goalnode)
+        parents, distances, found = self.build_BFS_parents(startnode, [goalnode])
+        return self.pathFromBFSParents(parents, found)
+    
+    # breadth-first search recording only where each node was reached from.
+    # linear in the size of the graph: each node is queued at most once and
+    #   each edge looked at at most once.
+    # edge weights ignored.
+    # returns (parents, distances, found)
+    #   - parents: dict of node => node it was reached from (root => None)
+    #   - distances: dict of node => number of edges from root
+    #   - found: first of goal_nodes reached, or None
+    # if goal_nodes provided, stops when it gets to one of them
+    def build_BFS_parents(self, root_node, goal_nodes=None):
+        if not self.hasNode(root_node):
+            raise NodeNotExistError(root_node)
+        
+        goal_set = set(goal_nodes) if goal_nodes else set()
+        parents = {root_node: None}
+        distances = {root_node: 0}
+        queue = deque([root_node])
+        while queue:
+            this_node = queue.popleft()
+            if this_node in goal_set:
+                return parents, distances, this_node
+            next_dist = distances[this_node] + 1
+            for adj in self.get_adj_nodes(this_node):
+                if adj not in parents:
+                    parents[adj] = this_node
+                    distances[adj] = next_dist
+                    queue.append(adj)
+        
+        return parents, distances, None
+    
+    # get path from root to goal out of the parents given by build_BFS_parents
+    # returns None if goal was not reached
+    def pathFromBFSParents(self, parents, goal):
+        if goal is None or goal not in parents:
+            return None
+        path = []
+        node = goal
+        while node is not None:
+            path.append(node)
+            node = parents[node]
+        path.reverse()
+        return path
     
     # get path from BFS tree
     def pathFromBFSTree(self, bfs_tree, root, goal):
         if not bfs_tree.hasNode(goal):
             return None
         path = [goal]
-        while path[0] is not root:
-            adj = bfs_tree.get_adj_nodes(path[0])
+        while path[-1] != root:
+            adj = bfs_tree.get_adj_nodes(path[-1])
             if adj:
-                path.insert(0,adj[0])
+                path.append(adj[0])
             else:
-                #pprint(bfs_tree.graph_dict)
-                #print "path so far:"
-                #pprint(path)
-                #print "root-goal:"
-                #print root,"-",goal
                 path = None
                 break
+        if path:
+            path.reverse()
         return path
     
     # build breadth-first-search tree as a graph.
     # edge weights ignored.
     # if goal_nodes provided, stops when it gets to one of them
+    # (build_BFS_parents is the cheaper search if only paths are needed)
     def build_BFS_tree(self, root_node, goal_nodes=None):
-        if not self.hasNode(root_node):
-            raise NodeNotExistError(root_node)
-        
-        # initialize tree to graph with single node: the root
+        parents, distances, found = self.build_BFS_parents(root_node, goal_nodes)
         bfs_tree = Graph(nodes=[root_node])
-        # list of nodes already encountered_nodes along search
-        encountered_nodes = [root_node]
-        # queue of next edges to look at
-        next_edges = deque()
-        # initialize next_edges
-        next_edges.append((None, root_node))
-        
-        while len(next_edges) > 0:
-            (parent, this_node) = next_edges.popleft()
-            #print "\nbfs: (parent, this):", (parent, this_node)
-            #print "bfs: encountered:", encountered_nodes
-            # add this node to bfs tree by putting edge pointing from here back to root
+        # edges point from each node back towards the root
+        for node, parent in parents.iteritems():
             if parent is not None:
-                bfs_tree.addEdge((this_node, parent, 1), directed=True)
-            if goal_nodes and (this_node in goal_nodes):
-                return bfs_tree
-            # get all adjacent nodes
-            adj_nodes = self.get_adj_nodes(this_node)
-            #print "bfs: adj:", adj_nodes
-            # filter only ones not encountered
-            adj_nodes = filter(lambda n: n not in encountered_nodes, adj_nodes)
-            #print "bfs: adj-post-filter:", adj_nodes
-            # update which nodes have been encountered
-            encountered_nodes.extend(adj_nodes)
-            # add new adjacent nodes to queue
-            for adj in adj_nodes:
-                next_edges.append((this_node, adj))
-        
+                bfs_tree.addEdge((node, parent, 1), directed=True)
         return bfs_tree
         
+    # edges that every path from root_node to any of goal_nodes must use
+    # (the bridges between root_node and the goals, with all goals merged into
+    #   one node so that paths between goals don't count as detours)
+    # returns set of frozenset([node1, node2]). edge weights ignored.
+    # iterative Tarjan bridge-finding, linear in the size of the graph.
+    def findCriticalEdges(self, root_node, goal_nodes):
+        if not self.hasNode(root_node):
+            raise NodeNotExistError(root_node)
+        goal_set = set(goal_nodes)
+        if root_node in goal_set:
+            return set()
+        GOAL = object()   # stands in for all goal nodes at once
+        
+        def merged_adj(node):
+            # (merged neighbor, original from, original to) for each edge
+            members = goal_set if node is GOAL else [node]
+            adj = []
+            for m in members:
+                for n in self.get_adj_nodes(m):
+                    rep = GOAL if n in goal_set else n
+                    # edges between 2 goals disappear in the merge
+                    if not (rep is GOAL and node is GOAL):
+                        adj.append((rep, m, n))
+            return adj
+        
+        disc = {root_node: 0}
+        low = {root_node: 0}
+        # True if the DFS subtree under a node contains the goals
+        reaches_goal = {GOAL: True}
+        critical = set()
+        # stack of [node, edge it was reached by, its remaining edges, went back yet]
+        stack = [[root_node, None, iter(merged_adj(root_node)), False]]
+        while stack:
+            frame = stack[-1]
+            node, in_edge, edges = frame[0], frame[1], frame[2]
+            advanced = False
+            for (adj, a, b) in edges:
+                # don't go straight back along the edge we came in on
+                #   (only once, so parallel edges still count as a detour)
+                if not frame[3] and in_edge is not None and (b, a) == in_edge:
+                    frame[3] = True
+                    continue
+                if adj in disc:
+                    low[node] = min(low[node], disc[adj])
+                else:
+                    disc[adj] = low[adj] = len(disc)
+                    reaches_goal.setdefault(adj, False)
+                    stack.append([adj, (a, b), iter(merged_adj(adj)), False])
+                    advanced = True
+                    break
+            if not advanced:
+                stack.pop()
+                if stack:
+                    parent = stack[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                    if reaches_goal[node]:
+                        reaches_goal[parent] = True
+                        # bridge with the goals on the far side
+                        if low[node] > disc[parent]:
+                            critical.add(frozenset(in_edge))
+        return critical
+    
     def get_adj_nodes(self, node):
         if not self.hasNode(node):
             return None          
@@ -0,0 +1,211 @@
+from collections import deque
+from Graph import Graph, GraphError, NodeNotExistError
+
+class GridGraph(Graph):
+    """Grid graph stored as one flag byte per square
+
+    Drop-in replacement for SpecialGraphs.GraphNet(M, N) as used by Game:
+    nodes are (row, col) tuples with 1 <= row <= M and 1 <= col <= N, and every
+    edge joins two squares that are adjacent in a cardinal direction. All edges
+    are undirected with weight 1.
+
+    Internally square (row, col) has integer id (row-1)*N + (col-1), and
+    cells[id] holds the UP/DOWN/LEFT/RIGHT flags of its open sides. Edge tests
+    are a single byte lookup, and duplicate() is a single bytearray copy.
+    """
+
+    UP    = 1
+    DOWN  = 2
+    LEFT  = 4
+    RIGHT = 8
+    # flag of the same edge as seen from the other square
+    OPPOSITE = {UP: DOWN, DOWN: UP, LEFT: RIGHT, RIGHT: LEFT}
+
+    def __init__(self, M=9, N=9, graph_in=None):
+        self.M = M
+        self.N = N
+        # (flag, id offset, row offset, col offset) for each direction, in GraphNet order
+        self.directions = ((GridGraph.UP,    -N, -1,  0),
+                           (GridGraph.DOWN,   N,  1,  0),
+                           (GridGraph.LEFT,  -1,  0, -1),
+                           (GridGraph.RIGHT,  1,  0,  1))
+        if graph_in:
+            self.cells = bytearray(graph_in.cells)
+        else:
+            # fully connected net: every side open except along the border
+            self.cells = bytearray(M*N)
+            for r in range(M):
+                for c in range(N):
+                    flags = 0
+                    if r > 0:   flags |= GridGraph.UP
+                    if r < M-1: flags |= GridGraph.DOWN
+                    if c > 0:   flags |= GridGraph.LEFT
+                    if c < N-1: flags |= GridGraph.RIGHT
+                    self.cells[r*N + c] = flags
+
+    def __repr__(self):
+        return "GridGraph(%d, %d, %r)" % (self.M, self.N, str(self.cells).encode('hex'))
+
+    def duplicate(self):
+        return GridGraph(self.M, self.N, graph_in=self)
+
+    #####################
+    ## id <-> node map ##
+    #####################
+
+    def node_to_id(self, node):
+        """integer id of the given (row, col) square, or None if off the board"""
+        try:
+            r, c = node
+        except (TypeError, ValueError):
+            return None
+        if 1 <= r <= self.M and 1 <= c <= self.N:
+            return (r-1)*self.N + (c-1)
+        return None
+
+    def id_to_node(self, i):
+        return (i / self.N + 1, i % self.N + 1)
+
+    def _edge_flags(self, node1, node2):
+        """return (id1, flag1, id2, flag2) of the edge between 2 squares, or None"""
+        i = self.node_to_id(node1)
+        j = self.node_to_id(node2)
+        if i is None or j is None:
+            return None
+        (r1, c1), (r2, c2) = node1, node2
+        for flag, _, dr, dc in self.directions:
+            if (r2 - r1, c2 - c1) == (dr, dc):
+                return (i, flag, j, GridGraph.OPPOSITE[flag])
+        return None
+
+    #####################
+    ## Graph interface ##
+    #####################
+
+    def size(self):
+        return self.M * self.N
+
+    def hasNode(self, node):
+        return self.node_to_id(node) is not None
+
+    def addNode(self, node):
+        if not self.hasNode(node):
+            raise GraphError("cannot add node {0} to a fixed grid".format(node))
+
+    def addEdge(self, e, directed=True):
+        """Open the path between 2 adjacent squares.
+
+        if not directed, also opens the path back
+        """
+        try:
+            node1, node2, weight = e
+        except ValueError:
+            node1, node2 = e
+        flags = self._edge_flags(node1, node2)
+        if flags is None:
+            raise GraphError("not a grid edge: {0}".format(e))
+        i, fi, j, fj = flags
+        self.cells[i] |= fi
+        if not directed:
+            self.cells[j] |= fj
+
+    def removeEdge(self, edge, directed=True):
+        """Close the path between 2 adjacent squares.
+
+        if not directed, also closes the path back
+        """
+        try:
+            node1, node2, weight = edge
+        except ValueError:
+            node1, node2 = edge
+        flags = self._edge_flags(node1, node2)
+        if flags is None:
+            return
+        i, fi, j, fj = flags
+        self.cells[i] &= ~fi
+        if not directed:
+            self.cells[j] &= ~fj
+
+    def hasEdge(self, edge):
+        try:
+            node1, node2, weight = edge
+        except ValueError:
+            node1, node2 = edge
+            weight = 1
+        if weight != 1:
+            return False
+        flags = self._edge_flags(node1, node2)
+        if flags is None:
+            return False
+        i, fi, _, _ = flags
+        return bool(self.cells[i] & fi)
+
+    def get_adj_nodes(self, node):
+        i = self.node_to_id(node)
+        if i is None:
+            return None
+        r, c = node
+        cell = self.cells[i]
+        return [(r+dr, c+dc) for flag, _, dr, dc in self.directions if cell & flag]
+
+    ##################
+    ## id searches  ##
+    ##################
+
+    def bfs_ids(self, start_id, goal_ids=None):
+        """breadth-first search over integer ids
+
+        returns (parents, found): parents is a list with the id each square was
+        reached from (-1 for the start, None if never reached); found is the id
+        of the first goal reached, or None
+        """
+        parents = [None] * (self.M * self.N)
+        parents[start_id] = -1
+        queue = deque([start_id])
+        cells, directions = self.cells, self.directions
+        while queue:
+            i = queue.popleft()
+            if goal_ids and i in goal_ids:
+                return parents, i
+            cell = cells[i]
+            for flag, di, _, _ in directions:
+                if cell & flag:
+                    j = i + di
+                    if parents[j] is None:
+                        parents[j] = i
+                        queue.append(j)
+        return parents, None
+
+    def _path_from_parents(self, parents, end_id):
+        path = []
+        i = end_id
+        while i != -1:
+            path.append(self.id_to_node(i))
+            i = parents[i]
+        path.reverse()
+        return path
+
+    def _ids(self, nodes):
+        ids = set()
+        for n in nodes:
+            i = self.node_to_id(n)
+            if i is None:
+                raise NodeNotExistError(n)
+            ids.add(i)
+        return ids
+
+    def hasPath(self, startnode, goalnodes):
+        return self.findShortestPath(startnode, goalnodes) is not None
+
+    def findPathBreadthFirst(self, startnode, goalnode):
+        return self.findShortestPath(startnode, [goalnode])
+
+    def findShortestPath(self, startnode, goalnodes):
+        """shortest path from startnode to the closest of goalnodes, or None"""
+        start_id = self.node_to_id(startnode)
+        if start_id is None:
+            raise NodeNotExistError(startnode)
+        parents, found = self.bfs_ids(start_id, self._ids(goalnodes))
+        if found is None:
+            return None
+        return self._path_from_parents(parents, found)
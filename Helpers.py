@@ -4,7 +4,7 @@
 #   converting to/from notation/geometry, and
 #   making new players
 
-import Game, SpecialGraphs
+import SpecialGraphs
 import string
 
 global_stats = {}
@@ -94,6 +94,57 @@ def all_walls():
             'V7a', 'V7b', 'V7c', 'V7d', 'V7e', 'V7f', 'V7g', 'V7h',\
             'V8a', 'V8b', 'V8c', 'V8d', 'V8e', 'V8f', 'V8g', 'V8h'];
 
+def wall_conflicts(wall_string):
+    """walls that cannot be on the board at the same time as the given wall
+
+    includes the wall itself, the crossing wall, and the 2 overlapping walls of
+    the same type (shifted by one square along its length)
+    """
+    wall_type = wall_string[0]
+    row, col = notation_to_point(wall_string[1:3])
+    if wall_type == "H":
+        cross, shifted = "V", [(row, col-1), (row, col+1)]
+    else:
+        cross, shifted = "H", [(row-1, col), (row+1, col)]
+    conflicts = [wall_string, cross + wall_string[1:3]]
+    for (r, c) in shifted:
+        if 1 <= r <= 8 and 1 <= c <= 8:
+            conflicts.append(wall_type + point_to_notation((r, c)))
+    return conflicts
+
+def walls_by_edge():
+    """dictionary of edge (as frozenset of 2 points) => list of walls that block it"""
+    by_edge = {}
+    for w, edges in WALL_EDGE_SETS.iteritems():
+        for e in edges:
+            by_edge.setdefault(e, []).append(w)
+    return by_edge
+
+# lookup tables for walls (computed once)
+#   the 2 edges each wall blocks, as unordered pairs of points
+WALL_EDGE_SETS = dict((w, [frozenset(e) for e in wall_string_to_edges(w)]) for w in all_walls())
+#   walls that can't coexist with each wall
+WALL_CONFLICTS = dict((w, wall_conflicts(w)) for w in all_walls())
+#   walls that block each edge
+EDGE_WALLS = walls_by_edge()
+
+################
+## Turn codes ##
+################
+
+# every turn fits in one small int: the 81 destination squares first
+#   ((row-1)*9 + (col-1)), then the 128 walls in the order of all_walls()
+NUM_SQUARES = 81
+NUM_TURN_CODES = NUM_SQUARES + len(all_walls())
+TURN_STRINGS = [point_to_notation((i / 9 + 1, i % 9 + 1)) for i in range(NUM_SQUARES)] + all_walls()
+TURN_CODES = dict((t, i) for i, t in enumerate(TURN_STRINGS))
+
+def turn_to_code(turn_string):
+    return TURN_CODES[turn_string]
+
+def code_to_turn(code):
+    return TURN_STRINGS[code]
+
 def get_all_legal_moves(game_state):
     """return all legal moves for the given player.
     
@@ -1,5 +1,6 @@
 # write history to file
 
+import ast
 import Game
 
 class Log:
@@ -10,12 +11,15 @@ class Log:
             filename = ".log_all.txt"
         with open(filename, "a+") as f:
             p_names = [p.name for p in game_state.players]
-            f.append("\n"+repr(p_names)+"\n")
-            f.append(repr(game_state.history)+"\n")
+            f.write("\n"+repr(p_names)+"\n")
+            f.write(repr(game_state.history)+"\n")
     
+    @staticmethod
     def read_log(filename=""):
+        """generator of (player names, history) for each game dumped to filename"""
         if not filename:
             filename = ".log_all.txt"
         with open(filename, "r") as f:
-            for l in f.read_lines():
-                
\ No newline at end of file
+            lines = [l.strip() for l in f if l.strip()]
+        for i in range(0, len(lines) - 1, 2):
+            yield ast.literal_eval(lines[i]), ast.literal_eval(lines[i+1])
@@ -0,0 +1,184 @@
+from time import time
+from math import log, sqrt
+import random
+from ThreadedAI import ThreadedAI
+from TreeAI import TreeAI
+from Playout import Playout
+
+class MCTSNode:
+    """One position in the search tree of MCTSAI
+
+    ply: turn that led here from the parent (None at the root)
+    mover: index of the player who played ply (wins are counted for them)
+    untried: plies not expanded yet (None until the node is first expanded)
+    winner: index of the player who has won in this position, or None
+    """
+
+    def __init__(self, parent=None, ply=None, mover=None, winner=None):
+        self.parent = parent
+        self.ply = ply
+        self.mover = mover
+        self.winner = winner
+        self.children = {}
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.0
+
+    def win_rate(self):
+        return self.wins / self.visits if self.visits else 0.0
+
+    def uct_child(self, exploration):
+        """child with the best upper confidence bound (UCT)"""
+        log_visits = log(self.visits)
+        best, best_value = None, None
+        for child in self.children.itervalues():
+            value = child.wins / child.visits + exploration * sqrt(log_visits / child.visits)
+            if best is None or value > best_value:
+                best, best_value = child, value
+        return best
+
+    def size(self):
+        """number of nodes in the subtree under (and including) this node"""
+        return 1 + sum(c.size() for c in self.children.itervalues())
+
+class MCTSAI(ThreadedAI):
+    """Monte Carlo Tree Search player (UCT)
+
+    Each iteration walks down the tree by UCT, expands one new ply (only the
+    plies TreeAI.get_relevant_plies considers), plays a fast random game
+    (Playout) from there to the end of the game and counts the win for whoever won.
+    The move played is the most visited one.
+
+    The tree is kept between turns: next time, the subtree under the turns
+    played since is reused as the new root.
+
+    iterations or time_budget (seconds) limit each move; with both, whichever
+    runs out first. With neither, DEFAULT_ITERATIONS are run.
+    """
+
+    DEFAULT_ITERATIONS = 1000
+    # UCT exploration constant (sqrt(2) is the textbook value for 0/1 rewards)
+    EXPLORATION = 1.4
+
+    def __init__(self, iterations=None, time_budget=None, exploration=EXPLORATION, reuse_tree=True):
+        ThreadedAI.__init__(self)
+        if not iterations and not time_budget:
+            iterations = MCTSAI.DEFAULT_ITERATIONS
+        self.iterations = iterations
+        self.time_budget = time_budget
+        self.exploration = exploration
+        self.reuse_tree = reuse_tree
+        # tree from the last search, and the game history at its root
+        self.root = None
+        self.root_history = []
+        # rollouts run by the last search
+        self.ROLLOUT_COUNT = 0
+
+    def get_move(self, game_stack):
+        game_state = self.private_position(game_stack)
+        if game_state is None:
+            return ""
+        tstart = time()
+        solved = self.solve_endgame(game_state, tstart)
+        if solved:
+            return solved
+        root = self.search(game_state)
+        if self.kill or not root.children:
+            return ""
+        best = max(root.children.itervalues(), key=lambda c: c.visits)
+        self.timer = time()-tstart
+        print "ran %d rollouts in %f seconds (%d nodes in tree)" % (self.ROLLOUT_COUNT, self.timer, root.size())
+        print "Chosen Move is %s (%d visits, win rate %.3f)" % (best.ply, best.visits, best.win_rate())
+        print "\n---------------------------------------------"
+        self.threaded_turn = best.ply
+        return best.ply
+
+    def search(self, game_state):
+        """run MCTS iterations on game_state until the budget runs out. returns the root node"""
+        start_time = time()
+        root = self.get_root(game_state)
+        self.ROLLOUT_COUNT = 0
+        i = 0
+        while not self.kill:
+            if self.iterations and i >= self.iterations:
+                break
+            if self.time_budget and time()-start_time > self.time_budget:
+                break
+            self.iterate(game_state, root)
+            i += 1
+        return root
+
+    def get_root(self, game_state):
+        """root node for game_state: reused from the last tree if it was searched, else new"""
+        history = game_state.history
+        n = len(self.root_history)
+        root = None
+        if self.reuse_tree and self.root and history[:n] == self.root_history:
+            root = self.root
+            for ply in history[n:]:
+                root = root.children.get(ply)
+                if root is None:
+                    break
+        if root is None:
+            root = MCTSNode()
+        else:
+            # detach, so the rest of the old tree can be freed
+            root.parent = None
+            root.ply = None
+        self.root = root
+        self.root_history = list(history)
+        return root
+
+    def iterate(self, game_state, root):
+        """one select / expand / rollout / backpropagate pass"""
+        node = root
+        records = []
+        # select: down through fully expanded nodes.
+        #   legal plies are only worked out where a node gets expanded
+        while node.winner is None and node.untried == [] and node.children:
+            node = node.uct_child(self.exploration)
+            records.append(game_state.make_turn(node.ply, update_legal=False))
+        # expand: one new child
+        if node.winner is None:
+            if node.untried is None:
+                if records:
+                    game_state.update_legal_moves()
+                    game_state.update_legal_walls()
+                node.untried = self.get_plies(game_state)
+            if node.untried:
+                ply = node.untried.pop()
+                mover = game_state.players.index(game_state.current_player)
+                records.append(game_state.make_turn(ply, update_legal=False))
+                winner = game_state.get_winner()
+                winner_index = game_state.players.index(winner) if winner else None
+                child = MCTSNode(node, ply, mover, winner_index)
+                node.children[ply] = child
+                node = child
+        # rollout
+        if node.winner is not None:
+            winner = node.winner
+        else:
+            winner = self.rollout(game_state)
+            self.ROLLOUT_COUNT += 1
+        for record in reversed(records):
+            game_state.unmake_turn(record)
+        # backpropagate
+        while node is not None:
+            node.visits += 1
+            if node.mover == winner:
+                node.wins += 1
+            node = node.parent
+
+    def get_plies(self, game_state):
+        """plies to expand, in reverse order of preference (popped from the end)"""
+        walls = [p for p in TreeAI.get_relevant_plies(game_state) if p not in game_state.legal_moves]
+        random.shuffle(walls)
+        moves = list(game_state.legal_moves)
+        random.shuffle(moves)
+        # pawn moves are tried first
+        return walls + moves
+
+    def rollout(self, game_state):
+        """play the game out fast from here (see Playout.py). returns the index of the winner"""
+        winner, plies = Playout(game_state).play()
+        return winner
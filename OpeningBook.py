@@ -0,0 +1,148 @@
+# Opening book: best plies for early positions, looked up by position hash.
+#   The book file is a small header and then fixed-size records sorted by
+#   (hash, turn code):
+#       hash        uint64  Zobrist hash of the position (see Zobrist.py)
+#       code        uint16  turn code of the ply (see Helpers.turn_to_code)
+#       depth       uint16  depth of the search that found the ply best there
+#       score       int32   search score of the ply, x100
+#   The file is memory-mapped and binary searched, so opening a book reads
+#   nothing but the header no matter how big it is.
+#
+#   build one with self-play searches (slow: run offline):
+#       python OpeningBook.py build <file> [games] [plies] [depth]
+#   and print what it holds for the start positions with:
+#       python OpeningBook.py show <file>
+
+import mmap
+import os
+import random
+import struct
+import sys
+import Helpers as h
+
+MAGIC = "QBOOK002"
+HEADER = struct.Struct("<8sI")
+RECORD = struct.Struct("<QHHi")
+
+class OpeningBook:
+    """read-only view of a book file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError("not an opening book: %s" % path)
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.num_records = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or size != HEADER.size + self.num_records * RECORD.size:
+            raise ValueError("not an opening book: %s" % path)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __len__(self):
+        return self.num_records
+
+    def record(self, i):
+        """(hash, turn code, depth, score) of the i-th record"""
+        return RECORD.unpack_from(self.data, HEADER.size + i * RECORD.size)
+
+    def lookup(self, key):
+        """list of (ply, depth, score) stored for the position with hash key, best first"""
+        # binary search for the first record with this hash
+        lo, hi = 0, self.num_records
+        while lo < hi:
+            mid = (lo + hi) / 2
+            if self.record(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        entries = []
+        i = lo
+        while i < self.num_records:
+            rkey, code, depth, score = self.record(i)
+            if rkey != key:
+                break
+            entries.append((h.code_to_turn(code), depth, score / 100.0))
+            i += 1
+        entries.sort(key=lambda e: (e[2], e[1]), reverse=True)
+        return entries
+
+    def choose(self, game_state):
+        """a book ply for game_state (random among the best scored), or None if out of book"""
+        legal = set(game_state.legal_moves) | set(game_state.legal_walls)
+        # a ply that isn't legal here means a hash collision: ignore it
+        entries = [e for e in self.lookup(game_state.hash) if e[0] in legal]
+        if not entries:
+            return None
+        top = entries[0][2]
+        return random.choice([ply for ply, depth, score in entries if score == top])
+
+def write_book(path, entries):
+    """write a book file from {hash: {ply: (depth, score)}}"""
+    records = []
+    for key, plies in entries.iteritems():
+        for ply, (depth, score) in plies.iteritems():
+            records.append((key, h.turn_to_code(ply), depth, int(round(100.0 * score))))
+    records.sort()
+    f = open(path, "wb")
+    f.write(HEADER.pack(MAGIC, len(records)))
+    for r in records:
+        f.write(RECORD.pack(*r))
+    f.close()
+    return len(records)
+
+def build_book(path, games=20, book_plies=6, depth=2, num_players=2, epsilon=0.25, verbose=True):
+    """play self-play games, searching each of the first book_plies positions to depth
+
+    The best plies of every search go in the book, with the depth searched
+    and the score. The game goes on with one of them, or (with chance
+    epsilon) a random relevant ply so that the book also covers less obvious
+    lines. Each position is only searched once.
+    returns the number of records written.
+    """
+    from Game import Game
+    from TreeAI import TreeAI
+    ai = TreeAI(depth=depth)
+    entries = {}
+    for g in range(games):
+        game_state = Game(num_players)
+        for i in range(book_plies):
+            key = game_state.hash
+            if key not in entries:
+                score, plies, stats = ai.IterativeDeepening(game_state.duplicate(), None, depth)
+                entries[key] = dict((ply, (ai.completed_depth, score)) for ply in plies)
+            plies = sorted(entries[key])
+            if not plies:
+                break
+            if random.random() < epsilon:
+                ply = random.choice(TreeAI.get_relevant_plies(game_state))
+            else:
+                ply = random.choice(plies)
+            game_state.execute_turn(ply)
+            if game_state.get_winner() is not None:
+                break
+        if verbose:
+            print "game %d of %d: %s (%d positions)" % (g+1, games, " ".join(game_state.history), len(entries))
+    return write_book(path, entries)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("build", "show"):
+        print "usage: python OpeningBook.py build <file> [games] [plies] [depth]"
+        print "       python OpeningBook.py show <file>"
+        sys.exit(1)
+    path = sys.argv[2]
+    if sys.argv[1] == "build":
+        args = [int(a) for a in sys.argv[3:6]]
+        n = build_book(path, *args)
+        print "wrote %d records to %s" % (n, path)
+    else:
+        from Game import Game
+        book = OpeningBook(path)
+        print "%d records" % len(book)
+        for num_players in (2, 4):
+            for first in range(1, num_players+1):
+                game_state = Game(num_players, starting_player_num=first)
+                print "%d players, player %d first:" % (num_players, first), book.lookup(game_state.hash)
@@ -0,0 +1,228 @@
+# Root-parallel alpha-beta for TreeAI.
+#   The plies at the root of the search are split across a pool of worker
+#   processes (threads don't help: the GIL runs one at a time). Young Brothers
+#   Wait: the first (best-ordered) ply is searched alone, in this process, to
+#   get a good alpha bound. The rest go to the workers, which all share one
+#   alpha bound so that a good score found by one narrows the window of the others.
+#
+#   run this module to measure speedup per worker count on fixed positions:
+#       python ParallelSearch.py [depth] [max workers]
+
+import multiprocessing
+import os
+import sys
+from time import time
+
+# seconds between checks for kill while waiting on workers
+POLL_INTERVAL = 0.05
+# seconds to wait for busy workers to wind down after running out of time,
+#   before giving up on them and restarting the pool
+STOP_GRACE = 1.0
+
+# per worker process: its own AI (and transposition table), the shared alpha
+#   and the shared flag telling queued root plies not to bother
+_worker_ai = None
+_shared_alpha = None
+_shared_stop = None
+
+def _init_worker(shared_alpha, shared_stop, ai_options):
+    global _worker_ai, _shared_alpha, _shared_stop
+    from TreeAI import TreeAI
+    # the search prints a lot. only the parent process gets to talk
+    sys.stdout = open(os.devnull, "w")
+    _shared_alpha = shared_alpha
+    _shared_stop = shared_stop
+    _worker_ai = TreeAI(**ai_options)
+
+def _search_root_ply(args):
+    """worker: search one root ply. returns (score, ply, SearchStats), or None if cut short"""
+    from TreeAI import TreeAI
+    from SearchStats import SearchStats
+    game_state, player_index, ply, depth, timeout, start_time = args
+    if _shared_stop.value:
+        return None
+    ai = _worker_ai
+    ai.stats = SearchStats(ai.timing)
+    player = game_state.players[player_index]
+    record = ai.make_turn(game_state, ply, depth)
+    if game_state.get_winner() is not None:
+        score = TreeAI.WIN_SCORE + depth
+    else:
+        alpha = _shared_alpha.value
+        child_score, plies = ai.AlphaBeta(game_state, player, -TreeAI.INF, -alpha, -1, depth-1,
+                                          timeout, start_time, height=1)
+        if ai.kill or (timeout and time()-start_time > timeout):
+            return None
+        score = -child_score
+    ai.unmake_turn(game_state, record)
+    with _shared_alpha.get_lock():
+        if score > _shared_alpha.value:
+            _shared_alpha.value = score
+    return (score, ply, ai.stats)
+
+def get_pool(ai):
+    """the AI's worker pool, started on first use"""
+    if ai.pool is None:
+        from TreeAI import TreeAI
+        ai.shared_alpha = multiprocessing.Value('d', -TreeAI.INF)
+        ai.shared_stop = multiprocessing.Value('b', 0)
+        ai.pool = multiprocessing.Pool(ai.workers, _init_worker, (ai.shared_alpha, ai.shared_stop, ai.options))
+    return ai.pool
+
+def stop_pool(ai):
+    if ai.pool is not None:
+        ai.pool.terminate()
+        ai.pool.join()
+        ai.pool = None
+
+def wind_down(ai, pending, remaining):
+    """after running out of time: make sure no worker is still searching a root ply
+
+    Queued plies are told not to start; plies being searched stop by
+    themselves at the same deadline. Waits for the remaining results, and
+    stops the pool if they take longer than STOP_GRACE.
+    """
+    ai.shared_stop.value = 1
+    deadline = time() + STOP_GRACE
+    try:
+        for i in range(remaining):
+            pending.next(max(deadline - time(), 0))
+    except multiprocessing.TimeoutError:
+        stop_pool(ai)
+
+def root_parallel_search(ai, game_state, depth, timeout=None, start_time=None, first_plies=None):
+    """same as ai.AlphaBeta(game_state, game_state.current_player, depth=depth, ...)
+
+    but with the root plies searched across ai.workers processes.
+    returns (best_score, best_plies), or (-INF, []) if killed or out of time
+    """
+    from TreeAI import TreeAI
+    if not start_time:
+        start_time = time()
+    player = game_state.current_player
+    player_index = game_state.players.index(player)
+    ai.stats.nodes += 1
+    plies = ai.generate_plies(game_state, 0, (first_plies or [])[:1])
+    if not plies:
+        return -TreeAI.INF, []
+
+    # eldest brother first, here, to set alpha
+    eldest = plies[0]
+    record = ai.make_turn(game_state, eldest, depth)
+    if game_state.get_winner() is not None:
+        eldest_score = TreeAI.WIN_SCORE + depth
+    else:
+        eldest_score, _ = ai.AlphaBeta(game_state, player, -TreeAI.INF, TreeAI.INF, -1, depth-1,
+                                       timeout, start_time, height=1)
+        eldest_score = -eldest_score
+    ai.unmake_turn(game_state, record)
+    if ai.kill or (timeout and time()-start_time > timeout):
+        return -TreeAI.INF, []
+    results = [(eldest_score, eldest)]
+
+    # younger brothers in parallel, all sharing one alpha
+    if len(plies) > 1:
+        pool = get_pool(ai)
+        ai.shared_alpha.value = eldest_score
+        ai.shared_stop.value = 0
+        # workers get a copy without AIs attached (they don't pickle), nor
+        #   the blocking walls cache (each worker builds its own)
+        copy_state = game_state.duplicate()
+        copy_state.blocking_walls_cache = {}
+        for p in copy_state.players:
+            p.ai = None
+        tasks = [(copy_state, player_index, ply, depth, timeout, start_time) for ply in plies[1:]]
+        pending = pool.imap_unordered(_search_root_ply, tasks)
+        for i in range(len(tasks)):
+            result = None
+            while result is None:
+                if ai.kill:
+                    stop_pool(ai)
+                    return -TreeAI.INF, []
+                if timeout and time()-start_time > timeout:
+                    wind_down(ai, pending, len(tasks) - i)
+                    return -TreeAI.INF, []
+                try:
+                    result = pending.next(POLL_INTERVAL)
+                except multiprocessing.TimeoutError:
+                    continue
+                if result is None:
+                    # worker ran out of time
+                    wind_down(ai, pending, len(tasks) - i - 1)
+                    return -TreeAI.INF, []
+            score, ply, stats = result
+            ai.stats.merge(stats)
+            results.append((score, ply))
+
+    results.sort(reverse=True)
+    best_score = results[0][0]
+    best_plies = [ply for score, ply in results if score == best_score]
+    if ai.tt:
+        from TranspositionTable import TranspositionTable
+        ai.tt.store(game_state.hash, depth, best_score, TranspositionTable.EXACT, best_plies[0])
+    return best_score, best_plies
+
+##################
+## Benchmarking ##
+##################
+
+# (name, number of players, turns)
+BENCHMARK_POSITIONS = [
+    ("2p start", 2, []),
+    ("2p midgame", 2, ["2e", "H7d", "3e", "V6f", "H3d", "8e", "V3c", "H6f"]),
+]
+
+def benchmark_position(num_players, turns):
+    from Game import Game
+    game_state = Game(num_players, starting_player_num=1)
+    for turn in turns:
+        game_state.execute_turn(turn)
+    return game_state
+
+def benchmark(depth=3, max_workers=None):
+    """time a fixed-depth search of each position with 1, 2, 4, ... workers
+
+    every run gets a freshly built position, so none of them starts with
+    what an earlier run worked out (e.g. the blocking walls cache)
+    """
+    from TreeAI import TreeAI
+    if not max_workers:
+        max_workers = multiprocessing.cpu_count()
+    worker_counts = [1]
+    while worker_counts[-1]*2 <= max_workers:
+        worker_counts.append(worker_counts[-1]*2)
+    if worker_counts[-1] != max_workers:
+        worker_counts.append(max_workers)
+
+    stdout = sys.stdout
+    devnull = open(os.devnull, "w")
+    try:
+        for name, num_players, turns in BENCHMARK_POSITIONS:
+            print "%s (depth %d)" % (name, depth)
+            base_time = None
+            for workers in worker_counts:
+                game_state = benchmark_position(num_players, turns)
+                ai = TreeAI(workers=workers, tt_megabytes=0)
+                sys.stdout = devnull
+                if workers > 1:
+                    # pool start-up isn't search time
+                    get_pool(ai)
+                tstart = time()
+                score, plies, stats = ai.IterativeDeepening(game_state, None, depth)
+                elapsed = time() - tstart
+                sys.stdout = stdout
+                stop_pool(ai)
+                if base_time is None:
+                    base_time = elapsed
+                print "  %2d workers: %7.2f s  speedup %5.2f  nodes %-7d score %6.2f  %s" % \
+                    (workers, elapsed, base_time / elapsed, stats.nodes, score, " ".join(plies))
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+
+if __name__ == "__main__":
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    # TreeAI uses the imported module, not __main__. so must the benchmark
+    import ParallelSearch
+    ParallelSearch.benchmark(depth, max_workers)
@@ -0,0 +1,129 @@
+# Perft: count the positions reachable in exactly N plies from reference
+#   positions, using Game's own legal move/wall generation and
+#   make_turn/unmake_turn.
+#   Counts are checked against the expected values stored below, so this
+#   is a regression test for move generation (update_available_points,
+#   wall_is_valid, the incremental update_legal_walls) as well as a
+#   throughput number for the board backends.
+#
+#   A game that is won before depth N has no positions beyond it.
+#
+#   usage:
+#       python Perft.py [max depth] [backend ...]
+#       python Perft.py verify [max depth]
+#   verify also checks the legal plies of every position searched against
+#   a from-scratch generator (slow: keep the depth small).
+
+import sys
+from time import time
+from Game import Game
+import Helpers as h
+import Playout
+import SpecialGraphs
+
+# (name, number of players, starting player, history, walls left per player or None,
+#  expected counts for depth 1, 2, ...)
+POSITIONS = [
+    ("start", 2, 1, [], None,
+        [131, 16677]),
+    ("walls", 2, 1, ["2e", "H7d", "V2d", "8e", "3e", "H5e", "H3e", "V6f"], None,
+        [110, 11815]),
+    ("jump", 2, 1, ["2e", "8e", "3e", "7e", "4e", "6e", "5e"], None,
+        [132, 16938]),
+    ("diagonal", 2, 1, ["2e", "8e", "3e", "7e", "4e", "6e", "5e", "H6e"], None,
+        [129, 15922]),
+    ("race", 2, 1, ["2e", "8e", "3e", "7e", "4e", "6e", "H6e", "V5e"], [0, 0],
+        [4, 8, 30, 108, 410, 1432]),
+    ("start", 4, 1, [], None,
+        [131, 16677]),
+    ("crowd", 4, 1, ["2e", "5h", "8e", "5b", "3e", "5g", "7e", "5c", "4e", "5f", "6e", "5d"], None,
+        [132, 16935]),
+]
+
+def make_position(num_players, starting_player, history, walls_left=None, backend="graph"):
+    game_state = Game(num_players, backend=backend, starting_player_num=starting_player)
+    for turn in history:
+        if game_state.execute_turn(turn) <= 0:
+            raise ValueError("illegal turn in reference position: %s" % turn)
+    if walls_left is not None:
+        for p, n in zip(game_state.players, walls_left):
+            game_state.set_num_walls(p, n)
+        game_state.update_legal_walls()
+    return game_state
+
+def reference_plies(game_state):
+    """legal plies worked out from scratch, without anything Game keeps up to date between turns
+
+    pawn moves come from Playout.pawn_moves (a separate implementation of
+    the jump rules), walls from Game.wall_is_valid
+    """
+    snapshot = Playout.Playout(game_state)
+    turn = snapshot.turn
+    others = set(sq for i, sq in enumerate(snapshot.positions) if i != turn)
+    squares = Playout.pawn_moves(snapshot.positions[turn], others, snapshot.down_open, snapshot.right_open)
+    moves = [h.point_to_notation(Playout.point(sq)) for sq in squares]
+    walls = [w for w in h.all_walls() if game_state.wall_is_valid(w)]
+    return sorted(moves + walls)
+
+def perft(game_state, depth, verify=False):
+    """number of positions exactly depth plies from game_state"""
+    plies = game_state.legal_moves + game_state.legal_walls
+    if verify and game_state.get_winner() is None:
+        expected = reference_plies(game_state)
+        if sorted(plies) != expected:
+            raise AssertionError("legal plies after %s: got %s, expected %s" %
+                                 (" ".join(game_state.history), sorted(plies), expected))
+    if depth <= 1:
+        # bulk count: no need to play the last ply
+        return len(plies) if depth == 1 else 1
+    count = 0
+    for ply in plies:
+        record = game_state.make_turn(ply, update_legal=True)
+        count += perft(game_state, depth-1, verify)
+        game_state.unmake_turn(record)
+    return count
+
+def divide(game_state, depth):
+    """perft for each root ply: {ply: count}. for tracking down a wrong count"""
+    counts = {}
+    for ply in game_state.legal_moves + game_state.legal_walls:
+        record = game_state.make_turn(ply, update_legal=True)
+        counts[ply] = perft(game_state, depth-1)
+        game_state.unmake_turn(record)
+    return counts
+
+def run(max_depth=2, backends=None, verify=False):
+    """perft every reference position up to max_depth. returns True if all counts match"""
+    if backends is None:
+        backends = sorted(SpecialGraphs.BOARD_BACKENDS.keys())
+    all_ok = True
+    for backend in backends:
+        print "BACKEND: %s" % backend
+        total_nodes = 0
+        total_time = 0.0
+        for name, num_players, first, history, walls_left, expected in POSITIONS:
+            game_state = make_position(num_players, first, history, walls_left, backend)
+            for depth in range(1, min(max_depth, len(expected)) + 1):
+                tstart = time()
+                count = perft(game_state, depth, verify)
+                telapsed = time() - tstart
+                ok = count == expected[depth-1]
+                all_ok = all_ok and ok
+                total_nodes += count
+                total_time += telapsed
+                print "  %dp %-10s depth %d: %8d %s %8.3f s %8.0f nodes/s" % \
+                    (num_players, name, depth, count, "ok  " if ok else "FAIL (expected %d)" % expected[depth-1],
+                     telapsed, count / telapsed if telapsed else 0.0)
+        print "  total: %d nodes in %.2f s = %.0f nodes/s" % \
+            (total_nodes, total_time, total_nodes / total_time if total_time else 0.0)
+    print "all counts match" if all_ok else "COUNTS DO NOT MATCH"
+    return all_ok
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    verify = bool(args) and args[0] == "verify"
+    if verify:
+        args = args[1:]
+    max_depth = int(args[0]) if args else (2 if verify else 6)
+    backends = args[1:] or None
+    sys.exit(0 if run(max_depth, backends, verify) else 1)
@@ -0,0 +1,218 @@
+# Fast playouts: random (shortest-path biased) games played to the end.
+#   A Playout is a snapshot of only what a game needs to keep going:
+#   pawn squares, open edges as bit masks (see BitboardGraph.py), placed
+#   walls as a bit mask, walls left, and each player's distance to goal for
+#   every square. No Game, Player or Graph objects, no turn strings.
+#
+#   run this module for a throughput benchmark:
+#       python Playout.py [seconds] [num players]
+
+from time import time
+import random
+import Helpers as h
+from BitboardGraph import edge_masks, expand_mask
+
+N = 9
+NUM_SQUARES = h.NUM_SQUARES
+ALL_MASK = (1 << NUM_SQUARES) - 1
+# squares with a square below (all but last row), to the right (all but last column)
+DOWN_MASK, RIGHT_MASK = edge_masks(N, N)
+
+def square(point):
+    row, col = point
+    return (row-1)*N + (col-1)
+
+def point(sq):
+    return (sq / N + 1, sq % N + 1)
+
+# walls by index (the order of h.all_walls(), so wall index = turn code - NUM_SQUARES)
+WALLS = h.all_walls()
+WALL_INDEX = dict((w, i) for i, w in enumerate(WALLS))
+
+def _wall_edge_masks(wall_string):
+    """(down_open bits, right_open bits) the wall closes"""
+    a = square(h.notation_to_point(wall_string[1:3]))
+    if wall_string[0] == "H":
+        return ((1 << a) | (1 << (a+1)), 0)
+    return (0, (1 << a) | (1 << (a+N)))
+
+# WALL_DOWN[i], WALL_RIGHT[i]: edge bits closed by wall i
+WALL_DOWN, WALL_RIGHT = zip(*[_wall_edge_masks(w) for w in WALLS])
+# WALL_CONFLICT_MASK[i]: bits of the walls that can't be placed alongside wall i
+WALL_CONFLICT_MASK = [sum(1 << WALL_INDEX[c] for c in h.WALL_CONFLICTS[w]) for w in WALLS]
+# EDGE_WALL_IDS[(sq1, sq2)]: indices of the walls that block the edge, both ways round
+EDGE_WALL_IDS = {}
+for _edge, _walls in h.EDGE_WALLS.iteritems():
+    _sq1, _sq2 = [square(pt) for pt in _edge]
+    EDGE_WALL_IDS[(_sq1, _sq2)] = EDGE_WALL_IDS[(_sq2, _sq1)] = [WALL_INDEX[w] for w in _walls]
+
+def distances(goal_mask, down_open, right_open):
+    """list: steps from each square to the nearest goal square (None if none reachable)"""
+    dist = [None] * NUM_SQUARES
+    layer = goal_mask
+    reached = goal_mask
+    d = 0
+    while layer:
+        m = layer
+        while m:
+            low = m & -m
+            dist[low.bit_length() - 1] = d
+            m ^= low
+        layer = expand_mask(layer, down_open, right_open, N) & ~reached
+        reached |= layer
+        d += 1
+    return dist
+
+def step(sq, direction, down_open, right_open):
+    """square one step from sq in direction 0-3 (up, down, left, right), or -1 if walled/off board"""
+    if direction == 0:
+        if sq >= N and (down_open >> (sq-N)) & 1:
+            return sq-N
+    elif direction == 1:
+        if (down_open >> sq) & 1:
+            return sq+N
+    elif direction == 2:
+        if sq % N and (right_open >> (sq-1)) & 1:
+            return sq-1
+    elif (right_open >> sq) & 1:
+        return sq+1
+    return -1
+
+# directions at right angles to each direction (for diagonal jumps)
+SIDEWAYS = ((2, 3), (2, 3), (0, 1), (0, 1))
+
+def pawn_moves(sq, others, down_open, right_open):
+    """squares the pawn on sq can move to, with the same jump rules as Game.update_available_points"""
+    moves = []
+    for d in range(4):
+        adj = step(sq, d, down_open, right_open)
+        if adj < 0:
+            continue
+        if adj not in others:
+            moves.append(adj)
+            continue
+        # jump the pawn in the way: straight over if open, else diagonally
+        skip = step(adj, d, down_open, right_open)
+        if skip >= 0:
+            if skip not in others:
+                moves.append(skip)
+        else:
+            for side in SIDEWAYS[d]:
+                t = step(adj, side, down_open, right_open)
+                if t >= 0 and t not in others:
+                    moves.append(t)
+    return moves
+
+class Playout:
+    """Minimal snapshot of a game position for playing out fast
+
+    Build one from a Game (Playout(game_state)), then call play() as many
+    times as needed; each play starts over from the snapshot.
+    """
+
+    # chance per turn that a player with walls left tries to place one
+    WALL_PROB = 0.2
+    # chance of a random pawn move instead of a step along a shortest path
+    EPSILON = 0.1
+    # playouts longer than this are scored by who is closest to their goal
+    MAX_PLIES = 200
+
+    def __init__(self, game_state):
+        players = game_state.players
+        self.positions = [square(p.position) for p in players]
+        self.num_walls = [p.num_walls for p in players]
+        self.goal_masks = [sum(1 << square(g) for g in p.goal_positions) for p in players]
+        self.turn = players.index(game_state.current_player)
+        self.walls = 0
+        self.down_open, self.right_open = DOWN_MASK, RIGHT_MASK
+        for w in game_state.walls:
+            i = WALL_INDEX[w]
+            self.walls |= 1 << i
+            self.down_open &= ~WALL_DOWN[i]
+            self.right_open &= ~WALL_RIGHT[i]
+        self.dists = [distances(g, self.down_open, self.right_open) for g in self.goal_masks]
+
+    def play(self, wall_prob=WALL_PROB, epsilon=EPSILON, max_plies=MAX_PLIES, rand=random, turns=None):
+        """play one game out from the snapshot. returns (winner index, plies played)
+
+        On each turn the mover may (with chance wall_prob, if it has walls
+        left) put a wall across the next step of the shortest path of the
+        opponent closest to winning. Otherwise it moves its pawn one step
+        closer to goal (a random legal move with chance epsilon).
+        If a list is given as turns, the turn strings played are appended to it.
+        """
+        positions = list(self.positions)
+        num_walls = list(self.num_walls)
+        dists = list(self.dists)
+        walls, down_open, right_open = self.walls, self.down_open, self.right_open
+        num_players = len(positions)
+        turn = self.turn
+        for ply in xrange(1, max_plies+1):
+            placed = False
+            if num_walls[turn] and rand.random() < wall_prob:
+                # block the leader (of the others) at their next step
+                target = min((i for i in range(num_players) if i != turn), key=lambda i: dists[i][positions[i]])
+                dist, sq = dists[target], positions[target]
+                want = dist[sq] - 1
+                nexts = [a for a in (step(sq, d, down_open, right_open) for d in range(4)) if a >= 0 and dist[a] == want]
+                if nexts:
+                    candidates = EDGE_WALL_IDS[(sq, rand.choice(nexts))]
+                    w = rand.choice(candidates)
+                    if not walls & WALL_CONFLICT_MASK[w]:
+                        new_down = down_open & ~WALL_DOWN[w]
+                        new_right = right_open & ~WALL_RIGHT[w]
+                        new_dists = [distances(g, new_down, new_right) for g in self.goal_masks]
+                        # legal only if nobody is cut off
+                        if all(new_dists[i][positions[i]] is not None for i in range(num_players)):
+                            walls |= 1 << w
+                            down_open, right_open, dists = new_down, new_right, new_dists
+                            num_walls[turn] -= 1
+                            placed = True
+                            if turns is not None:
+                                turns.append(WALLS[w])
+            if not placed:
+                sq = positions[turn]
+                others = positions[:turn] + positions[turn+1:]
+                moves = pawn_moves(sq, others, down_open, right_open)
+                if moves:
+                    dist = dists[turn]
+                    if rand.random() < epsilon:
+                        sq = rand.choice(moves)
+                    else:
+                        best = min(dist[m] for m in moves)
+                        sq = rand.choice([m for m in moves if dist[m] == best])
+                    positions[turn] = sq
+                    if turns is not None:
+                        turns.append(h.point_to_notation(point(sq)))
+                    if dist[sq] == 0:
+                        return turn, ply
+            turn = (turn + 1) % num_players
+        # too long: closest to goal wins
+        return min(range(num_players), key=lambda i: dists[i][positions[i]]), max_plies
+
+##################
+## Benchmarking ##
+##################
+
+def benchmark(seconds=5.0, num_players=2):
+    """play games from the start position for a while and report games/sec"""
+    from Game import Game
+    playout = Playout(Game(num_players, starting_player_num=1))
+    wins = [0] * num_players
+    total_plies = 0
+    games = 0
+    tstart = time()
+    while time()-tstart < seconds:
+        winner, plies = playout.play()
+        wins[winner] += 1
+        total_plies += plies
+        games += 1
+    elapsed = time()-tstart
+    print "%d players: %d games in %.2f s = %.1f games/sec" % (num_players, games, elapsed, games / elapsed)
+    print "  average length %.1f plies, wins by player %s" % (float(total_plies) / games, wins)
+
+if __name__ == "__main__":
+    import sys
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    num_players = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    benchmark(seconds, num_players)
@@ -0,0 +1,77 @@
+from time import time
+
+class SearchStats:
+    """Counters and timers for one search by TreeAI
+
+    nodes: positions visited (including leaves)
+    leaves: positions scored by the evaluation function
+    cutoffs: beta cutoffs, by remaining depth of the node that was cut off
+    tt_cutoffs: nodes answered straight from the transposition table
+    times: seconds spent per phase, only if timing is on:
+        'plies' (generating plies), 'eval' (scoring leaves), 'make' (make/unmake)
+    elapsed: seconds from start() to stop()
+
+    Counting is cheap and always on. Phase timing costs 2 calls to time()
+    per phase per node, so it is off unless asked for. trace, if given, is
+    called as trace(height, i, n, ply) for every ply searched (the i-th of n
+    at that height): use print_trace for the old per-node printout.
+    """
+
+    PHASES = ('plies', 'eval', 'make')
+
+    def __init__(self, timing=False, trace=None):
+        self.timing = timing
+        self.trace = trace
+        self.nodes = 0
+        self.leaves = 0
+        self.cutoffs = {}
+        self.tt_cutoffs = 0
+        self.times = dict((phase, 0.0) for phase in SearchStats.PHASES)
+        self.start_time = None
+        self.elapsed = 0.0
+
+    def start(self):
+        self.start_time = time()
+
+    def stop(self):
+        if self.start_time is not None:
+            self.elapsed = time() - self.start_time
+
+    def cutoff(self, depth):
+        self.cutoffs[depth] = self.cutoffs.get(depth, 0) + 1
+
+    def merge(self, other):
+        """add the counts and times of another search (e.g. from a worker process)"""
+        self.nodes += other.nodes
+        self.leaves += other.leaves
+        for depth, n in other.cutoffs.iteritems():
+            self.cutoffs[depth] = self.cutoffs.get(depth, 0) + n
+        self.tt_cutoffs += other.tt_cutoffs
+        for phase, t in other.times.iteritems():
+            self.times[phase] += t
+
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {'nodes': self.nodes,
+                'leaves': self.leaves,
+                'cutoffs': dict(self.cutoffs),
+                'tt-cutoffs': self.tt_cutoffs,
+                'times': dict(self.times),
+                'elapsed': self.elapsed,
+                'nodes/sec': self.nodes_per_second()}
+
+    def __str__(self):
+        lines = ["%d nodes (%d leaves) in %f seconds: %.0f nodes/sec" %
+                    (self.nodes, self.leaves, self.elapsed, self.nodes_per_second()),
+                 "cutoffs by depth: %s, from transposition table: %d" %
+                    (", ".join("%d: %d" % (d, n) for d, n in sorted(self.cutoffs.items())) or "none",
+                     self.tt_cutoffs)]
+        if self.timing:
+            lines.append("time in " + ", ".join("%s %f s" % (phase, self.times[phase]) for phase in SearchStats.PHASES))
+        return "\n".join(lines)
+
+    @staticmethod
+    def print_trace(height, i, n, ply):
+        print "(%-3d of %-3d)%s%s" % (i+1, n, " " + "   "*height, ply)
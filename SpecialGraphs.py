@@ -1,4 +1,6 @@
 from Graph import Graph
+from BitboardGraph import BitboardGraph
+from GridGraph import GridGraph
 # some special cases of graphs
 
 def GraphNet(M, N):
@@ -19,6 +21,27 @@ def GraphNet(M, N):
                 G.addEdge((node, a));
     return G;
 
+def BitboardNet(M, N):
+    """same MxN net as GraphNet, stored as bit masks (see BitboardGraph)"""
+    return BitboardGraph(M, N);
+
+def GridNet(M, N):
+    """same MxN net as GraphNet, stored as a flag byte per square (see GridGraph)"""
+    return GridGraph(M, N);
+
+# interchangeable representations of the board, selectable by name
+BOARD_BACKENDS = {"graph": GraphNet,
+                  "bitboard": BitboardNet,
+                  "grid": GridNet};
+
+def BoardNet(M, N, backend="graph"):
+    """create an MxN net with the named backend (a key of BOARD_BACKENDS)"""
+    try:
+        make_net = BOARD_BACKENDS[backend];
+    except KeyError:
+        raise ValueError("unknown board backend: {0}".format(backend));
+    return make_net(M, N);
+
 def graph_net_sortfunc_row_inc(node):
     (r, c) = node;
     return -r;
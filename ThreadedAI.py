@@ -0,0 +1,63 @@
+from threading import Thread
+from time import time
+import Endgame
+
+class ThreadedAI:
+    """Base class for AIs that TkBoard runs in a background thread
+
+    TkBoard.get_ai_move calls get_move_thread_start(game_stack) once, then
+    polls get_threaded_move() until the turn is ready. kill_thread() asks a
+    running search to give up as soon as it can.
+
+    Subclasses implement get_move(game_stack), which must set
+    self.threaded_turn (and self.timer, in seconds) when done. It can start
+    with private_position() and solve_endgame(), which every AI needs.
+    """
+
+    def __init__(self):
+        self.threaded_turn = ""
+        self.thread_started = False
+        self.kill = False
+        self.timer = 0
+
+    def get_move_thread_start(self, *args, **kargs):
+        if not self.thread_started:
+            self.thread_started = True
+            th = Thread(target=lambda:self.get_move(*args, **kargs))
+            th.start()
+
+    def kill_thread(self):
+        self.kill = True
+
+    def get_threaded_move(self):
+        if self.threaded_turn:
+            turn = self.threaded_turn
+            self.threaded_turn = ""
+            self.thread_started = False
+            return turn, self.timer
+        else:
+            return None, -1
+
+    def private_position(self, game_stack):
+        """a copy of the current position for the AI to search in, or None if it isn't an AI's turn"""
+        print "AI: GET_MOVE CALLED"
+        # search plays turns in place (make/unmake), so work on a private copy
+        game_state = game_stack.current.duplicate()
+        if not game_state.current_player.ai:
+            print "WTF, mate? i'm not AI"
+            self.threaded_turn = ""
+            return None
+        return game_state
+
+    def solve_endgame(self, game_state, tstart):
+        """the move to play if game_state is a pure pawn race (see Endgame.solve), else None"""
+        solved = Endgame.solve(game_state)
+        if not solved:
+            return None
+        chosen_ply, result, depth = solved
+        self.timer = (time()-tstart)
+        print "endgame solved in %f seconds: %s, %s plies to go" % (self.timer, Endgame.RESULT_NAMES[result], depth)
+        print "Chosen Move is %s" % chosen_ply
+        print "\n---------------------------------------------"
+        self.threaded_turn = chosen_ply
+        return chosen_ply
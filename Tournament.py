@@ -0,0 +1,174 @@
+# Headless self-play for comparing and tuning TreeAI score weights.
+#   Games between TreeAIs with different score_weights (see
+#   TreeAI.state_score_naive) are played across a pool of processes, with
+#   no TkBoard. Every game has its own seed and is played at a fixed depth
+#   (reproducible) or on a fixed time per move (not quite: it depends on
+#   machine speed).
+#
+#   usage:
+#       python Tournament.py match <weights> <weights> [options]
+#       python Tournament.py roundrobin <weights> <weights> [<weights> ...] [options]
+#       python Tournament.py spsa [<starting weights>] [options]
+#   weights are comma separated, e.g. 0.5,1.0. see --help for options
+
+import multiprocessing
+import os
+import random
+import sys
+from optparse import OptionParser
+from time import time
+
+# games that go on this long are draws
+MAX_PLIES = 200
+
+def _init_worker():
+    # AIs print every move. keep quiet
+    sys.stdout = open(os.devnull, "w")
+
+def play_game(args):
+    """play one game between 2 weight vectors. returns (winner: 0, 1 or None for a draw, plies played)
+
+    args is (weights of player 1, weights of player 2, seed, depth, time_budget)
+    """
+    from GameStack import GameStack
+    from TreeAI import TreeAI
+    weights_1, weights_2, seed, depth, time_budget = args
+    random.seed(seed)
+    game_stack = GameStack(2, starting_player_num=1)
+    ais = [TreeAI(score_weights=list(w), depth=depth, time_budget=time_budget, tt_megabytes=4)
+           for w in (weights_1, weights_2)]
+    for p, ai in zip(game_stack.current.players, ais):
+        p.ai = ai
+    while len(game_stack.current.history) < MAX_PLIES:
+        game_state = game_stack.current
+        turn = game_state.current_player.ai.get_move(game_stack)
+        if not turn or game_stack.execute_turn(turn) <= 0:
+            # no move found (or an illegal one): a loss for the side to move
+            return 1 - (game_state.current_player_num - 1), len(game_state.history)
+        winner = game_stack.current.get_winner()
+        if winner is not None:
+            return game_stack.current.players.index(winner), len(game_stack.current.history)
+    return None, MAX_PLIES
+
+def play_games(pairings, depth, time_budget, workers, seed):
+    """play a game for each (i, j, weights i, weights j) of pairings, in parallel
+
+    each pairing is played twice, with each side moving first once.
+    returns list of (i, j, score of i) with score 1, 0.5 or 0
+    """
+    tasks = []
+    for n, (i, j, wi, wj) in enumerate(pairings):
+        game_seed = seed + n
+        tasks.append(((i, j), (wi, wj, game_seed, depth, time_budget)))
+        tasks.append(((j, i), (wj, wi, game_seed, depth, time_budget)))
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, _init_worker)
+        try:
+            outcomes = pool.map(play_game, [args for players, args in tasks])
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        stdout = sys.stdout
+        _init_worker()
+        try:
+            outcomes = [play_game(args) for players, args in tasks]
+        finally:
+            sys.stdout = stdout
+    results = []
+    for ((first, second), args), (winner, plies) in zip(tasks, outcomes):
+        score = 0.5 if winner is None else (1.0 if winner == 0 else 0.0)
+        results.append((first, second, score))
+    return results
+
+def elo_ratings(results, num_players, iterations=200, k=16.0):
+    """ratings that best fit the results (list of (i, j, score of i)), averaging 0
+
+    fit by repeatedly moving each rating by how much it over- or
+    under-predicts that player's total score
+    """
+    ratings = [0.0] * num_players
+    for it in range(iterations):
+        surplus = [0.0] * num_players
+        for i, j, score in results:
+            expected = 1.0 / (1.0 + 10 ** ((ratings[j] - ratings[i]) / 400.0))
+            surplus[i] += score - expected
+            surplus[j] -= score - expected
+        ratings = [r + k * s for r, s in zip(ratings, surplus)]
+        mean = sum(ratings) / num_players
+        ratings = [r - mean for r in ratings]
+    return ratings
+
+def round_robin(weight_vectors, games_per_pair=2, depth=2, time_budget=None, workers=1, seed=0):
+    """every weight vector against every other. returns (results, ratings)"""
+    pairings = []
+    for i in range(len(weight_vectors)):
+        for j in range(i+1, len(weight_vectors)):
+            for g in range(games_per_pair):
+                pairings.append((i, j, weight_vectors[i], weight_vectors[j]))
+    results = play_games(pairings, depth, time_budget, workers, seed)
+    return results, elo_ratings(results, len(weight_vectors))
+
+def print_table(weight_vectors, results, ratings):
+    print "%-4s %-20s %6s %8s %7s" % ("", "weights", "games", "score", "elo")
+    order = sorted(range(len(weight_vectors)), key=lambda i: ratings[i], reverse=True)
+    for i in order:
+        games = [r for r in results if i in r[:2]]
+        score = sum(s if a == i else 1-s for a, b, s in games)
+        print "%-4d %-20s %6d %8.1f %7.0f" % (i, ",".join("%g" % w for w in weight_vectors[i]),
+                                             len(games), score, ratings[i])
+
+def spsa(theta, iterations=20, games=4, depth=2, time_budget=None, workers=1, seed=0,
+         a=0.05, c=0.2, alpha=0.602, gamma=0.101):
+    """tune weights by SPSA (simultaneous perturbation stochastic approximation)
+
+    each iteration plays theta + c_k*delta against theta - c_k*delta, for a
+    random +-1 vector delta, and moves theta along delta by how much better
+    the + side did. step sizes a_k and c_k shrink with the standard exponents.
+    returns the final weights
+    """
+    rng = random.Random(seed)
+    theta = list(theta)
+    for k in range(iterations):
+        a_k = a / (k + 1) ** alpha
+        c_k = c / (k + 1) ** gamma
+        delta = [rng.choice((-1, 1)) for t in theta]
+        plus = [t + c_k * d for t, d in zip(theta, delta)]
+        minus = [t - c_k * d for t, d in zip(theta, delta)]
+        results = play_games([(0, 1, plus, minus)] * games, depth, time_budget, workers, seed + 1000 * (k+1))
+        # + side's score, from -1 (lost all) to 1 (won all)
+        margin = 2 * sum(s if i == 0 else 1-s for i, j, s in results) / len(results) - 1
+        theta = [t + a_k * margin / (2 * c_k * d) for t, d in zip(theta, delta)]
+        print "iteration %d: + side scored %+.2f, weights now %s" % (k+1, margin, ",".join("%.3f" % t for t in theta))
+    return theta
+
+def parse_weights(s):
+    return [float(w) for w in s.split(",")]
+
+if __name__ == "__main__":
+    from TreeAI import TreeAI
+    parser = OptionParser(usage="python Tournament.py match|roundrobin|spsa [weights ...] [options]")
+    parser.add_option("-d", "--depth", type="int", default=2, help="search depth per move (default 2)")
+    parser.add_option("-t", "--time", type="float", default=None, help="seconds per move (instead of fixed depth)")
+    parser.add_option("-g", "--games", type="int", default=2, help="game pairs per pairing / SPSA iteration")
+    parser.add_option("-w", "--workers", type="int", default=multiprocessing.cpu_count(), help="processes")
+    parser.add_option("-s", "--seed", type="int", default=0, help="base random seed")
+    parser.add_option("-i", "--iterations", type="int", default=20, help="SPSA iterations")
+    options, args = parser.parse_args()
+    if not args or args[0] not in ("match", "roundrobin", "spsa"):
+        parser.print_usage()
+        sys.exit(1)
+    mode, weights = args[0], [parse_weights(a) for a in args[1:]]
+    tstart = time()
+    if mode == "spsa":
+        start = weights[0] if weights else TreeAI.DEFAULT_WEIGHTS
+        final = spsa(start, options.iterations, options.games, options.depth, options.time,
+                     options.workers, options.seed)
+        # check the result against where it started
+        weights = [start, final]
+    if len(weights) < 2:
+        parser.error("need at least 2 weight vectors")
+    results, ratings = round_robin(weights, options.games, options.depth, options.time,
+                                   options.workers, options.seed)
+    print_table(weights, results, ratings)
+    print "%d games in %.1f seconds" % (len(results), time()-tstart)
@@ -0,0 +1,83 @@
+class TranspositionTable:
+    """Fixed-size cache of search results, keyed by position hash (see Zobrist.py)
+
+    Each entry is (key, depth, score, flag, best_ply):
+        depth: how many plies deep the position was searched
+        flag: EXACT if score is the true value at that depth,
+              LOWER if the search failed high (true value >= score),
+              UPPER if it failed low (true value <= score)
+        best_ply: best ply found (for move ordering), or None
+
+    The table is a fixed number of buckets, chosen from a memory budget. Each
+    bucket has 2 slots:
+        depth-preferred: only replaced by a search at least as deep
+        always-replace: takes everything the depth-preferred slot turns down
+    so deep results survive while recent shallow ones are still kept.
+    """
+
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+    # rough size of one stored entry in bytes (tuple + its ints + list slot)
+    ENTRY_BYTES = 120
+
+    def __init__(self, megabytes=16):
+        self.num_buckets = max(1, int(megabytes * 2**20) / (2 * TranspositionTable.ENTRY_BYTES))
+        self.clear()
+
+    def clear(self):
+        self.depth_slots  = [None] * self.num_buckets
+        self.always_slots = [None] * self.num_buckets
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        # probes where the bucket was full of other positions
+        self.collisions = 0
+        self.stores = 0
+        # stores that threw out an entry for another position
+        self.overwrites = 0
+
+    def probe(self, key):
+        """entry stored for key, or None"""
+        i = key % self.num_buckets
+        for entry in (self.depth_slots[i], self.always_slots[i]):
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry
+        self.misses += 1
+        if self.depth_slots[i] is not None or self.always_slots[i] is not None:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, score, flag, best_ply):
+        i = key % self.num_buckets
+        entry = (key, depth, score, flag, best_ply)
+        self.stores += 1
+        current = self.depth_slots[i]
+        if current is None or current[0] == key or depth >= current[1]:
+            if current is not None and current[0] != key:
+                # demote the old deep entry rather than lose it outright
+                self._store_always(i, current)
+            self.depth_slots[i] = entry
+        else:
+            self._store_always(i, entry)
+
+    def _store_always(self, i, entry):
+        old = self.always_slots[i]
+        if old is not None and old[0] != entry[0]:
+            self.overwrites += 1
+        self.always_slots[i] = entry
+
+    def stats(self):
+        probes = self.hits + self.misses
+        used = sum(1 for e in self.depth_slots if e is not None) + \
+               sum(1 for e in self.always_slots if e is not None)
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'collisions': self.collisions,
+                'hit-rate': float(self.hits) / probes if probes else 0.0,
+                'stores': self.stores,
+                'overwrites': self.overwrites,
+                'fill': float(used) / (2 * self.num_buckets)}
@@ -1,26 +1,89 @@
 from time import time, sleep
 import json
-from threading import Thread
 import random
+from threading import Thread
 import Helpers as h
+from ThreadedAI import ThreadedAI
+import Endgame
+from TranspositionTable import TranspositionTable
+from SearchStats import SearchStats
+from EvalCache import EvalCache
+from OpeningBook import OpeningBook
+import Zobrist
+import ParallelSearch
 
-class TreeAI():
+class TreeAI(ThreadedAI):
     
     INF = 1000000
+    # score for a ply that wins the game (plus remaining depth, so sooner wins score higher)
+    WIN_SCORE = 10000
     DEFAULT_WEIGHTS = [0.5, 1.0]
-    PLY_COUNT = 0
+    DEFAULT_DEPTH = 3
+    # deepest iteration tried when searching on a time budget
+    MAX_DEPTH = 20
+    # move ordering: killer plies kept per height in the tree
+    NUM_KILLERS = 2
     
-    def __init__(self, score_func=None, score_weights=None):
+    def __init__(self, score_func=None, score_weights=None, tt_megabytes=16, time_budget=None, depth=DEFAULT_DEPTH, workers=1,
+                 timing=False, trace=None, eval_cache_size=0, ponder=False,
+                 book=None):
+        """score_func or score_weights choose the evaluation (default: state_score_naive)
+        
+        time_budget: seconds per move. If given, get_move deepens the search
+            until time runs out. Otherwise it searches to the given depth.
+        tt_megabytes: size of the transposition table (0 for none)
+        workers: number of processes to split the root plies across (see
+            ParallelSearch.py). score_func must be picklable if workers > 1
+        timing, trace: extra instrumentation of each search (see SearchStats)
+        eval_cache_size: scores of this many leaf positions are remembered
+            (see EvalCache; 0 for none). Worth it for costly score functions:
+            the naive score is only a few distance field lookups, about as
+            cheap as a cache lookup
+        ponder: after moving, keep searching in the background (see start_pondering)
+        book: opening book (OpeningBook or path to a book file) to play from
+            before searching
+        """
+        ThreadedAI.__init__(self)
+        # kept so that worker processes can build the same AI
+        self.options = {'score_func': score_func, 'score_weights': score_weights,
+                        'tt_megabytes': tt_megabytes, 'timing': timing,
+                        'eval_cache_size': eval_cache_size}
         if score_func:
             self.score_func = score_func
         elif score_weights:
             self.score_func = lambda game_state, p: TreeAI.state_score_naive(game_state, p, score_weights)
         else:
             self.score_func = lambda game_state, p: TreeAI.state_score_naive(game_state, p, self.DEFAULT_WEIGHTS)
-        self.threaded_turn = ""
-        self.thread_started = False
-        self.kill = False
-        self.timer = 0
+        # leaf scores by position (None to disable)
+        self.eval_cache = EvalCache(self.score_func, eval_cache_size) if eval_cache_size else None
+        if self.eval_cache:
+            self.score_func = self.eval_cache
+        # transposition table shared by all searches of this AI (None to disable)
+        self.tt = TranspositionTable(tt_megabytes) if tt_megabytes else None
+        self.time_budget = time_budget
+        self.depth = depth
+        # depth of the last completed iteration
+        self.completed_depth = 0
+        # move ordering tables (see order_plies)
+        self.killers = {}
+        self.history_table = [0] * h.NUM_TURN_CODES
+        # nodes searched by each iteration of the last IterativeDeepening
+        self.iteration_nodes = []
+        # counters of the current (or last) search
+        self.timing = timing
+        self.trace = trace
+        self.stats = SearchStats(timing, trace)
+        # background search of the predicted position while the opponent thinks
+        self.ponder = ponder
+        self.ponder_thread = None
+        # (history searched, depth, best score, best plies) of the last ponder
+        self.ponder_result = None
+        if isinstance(book, basestring):
+            book = OpeningBook(book)
+        self.book = book
+        # root-parallel search (pool is started on first use)
+        self.workers = workers
+        self.pool = None
     
     @classmethod
     def state_score_naive(self, game_state, player, weights):
@@ -34,42 +97,21 @@ class TreeAI():
         my_walls = player.num_walls
         their_walls = max([p.num_walls for p in other_players])
         walls_diff = (my_walls - their_walls)
-        # path length score
-        my_path = len(game_state.get_shortest_path_player(player))
-        their_path = min([len(game_state.get_shortest_path_player(p)) for p in other_players])
+        # path length score (distance field lookups, no search)
+        my_path = game_state.get_path_length(player)
+        their_path = min([game_state.get_path_length(p) for p in other_players])
         paths_diff = their_path - my_path
         
         return weights[0]*walls_diff + weights[1]*paths_diff
 
-    def get_move_thread_start(self, *args, **kargs):
-        if not self.thread_started:
-            self.thread_started = True
-            th = Thread(target=lambda:self.get_move(*args, **kargs))
-            th.start()
-    
-    def kill_thread(self):
-        self.kill = True
-    
-    def get_threaded_move(self):
-        if self.threaded_turn:
-            turn = self.threaded_turn
-            self.threaded_turn = ""
-            self.thread_started = False
-            return turn, self.timer
-        else:
-            return None, -1
-      
     def get_move(self, game_stack):
-        print "AI: GET_MOVE CALLED"
         #print "sleeping to let game state update.."
         #sleep(0.1)
-        game_state = game_stack.current
-        if not game_state.current_player.ai:
-            print "WTF, mate? i'm not AI"
-            self.threaded_turn = ""
+        pondered = self.stop_pondering()
+        game_state = self.private_position(game_stack)
+        if game_state is None:
             return ""
         #all_plies = game_state.legal_moves + game_state.legal_walls
-        self.PLY_COUNT = 0
         tstart = time()
         """
         for i in range(len(all_plies)):
@@ -84,99 +126,465 @@ class TreeAI():
             game_state.undo()
         """
         #best_score, best_plies = self.NegaMax(game_state, game_state.current_player)
-        best_score, best_plies = self.AlphaBeta(game_stack, game_state.current_player, depth=3)
+        book_ply = self.book.choose(game_state) if self.book else None
+        if book_ply:
+            self.timer = (time()-tstart)
+            print "Chosen Move is %s (from opening book)" % book_ply
+            print "\n---------------------------------------------"
+            self.threaded_turn = book_ply
+            return book_ply
+        # pure pawn race: no need to search
+        solved = self.solve_endgame(game_state, tstart)
+        if solved:
+            return solved
+        if pondered and pondered[0] == game_state.history:
+            # opponent played the predicted reply: the ponder search was of this very position
+            _, ponder_depth, ponder_score, ponder_plies = pondered
+            print "ponder hit (searched to depth %d)" % ponder_depth
+        else:
+            ponder_depth = 0
+        if ponder_depth and not self.time_budget and ponder_depth >= self.depth:
+            best_score, best_plies, stats = ponder_score, ponder_plies, self.stats
+            self.completed_depth = ponder_depth
+        elif self.time_budget:
+            # the transposition table is warm from pondering, so shallow iterations are quick
+            best_score, best_plies, stats = self.IterativeDeepening(game_state, self.time_budget, TreeAI.MAX_DEPTH)
+            if ponder_depth > self.completed_depth:
+                best_score, best_plies = ponder_score, ponder_plies
+                self.completed_depth = ponder_depth
+        else:
+            best_score, best_plies, stats = self.IterativeDeepening(game_state, None, self.depth)
         if best_plies:
             # now sort by score
             chosen_ply = random.choice(best_plies)
             self.timer = (time()-tstart)
-            print "analyzed %d positions in %f seconds" % (self.PLY_COUNT, self.timer)
+            print "searched to depth %d in %f seconds" % (self.completed_depth, self.timer)
+            print stats
+            print "effective branching factor: %.2f" % self.effective_branching_factor()
+            if self.tt:
+                print "transposition table:", self.tt.stats()
+            if self.eval_cache:
+                print "evaluation cache:", self.eval_cache.stats()
             print "Chosen Move is %s with score %f" % (chosen_ply, best_score)
             if len(best_plies) > 1:
                 print "All moves with same score are:"
                 for ply in best_plies:
                     print "\t%s" % ply,
             print "\n---------------------------------------------"
+            if self.ponder:
+                self.start_pondering(game_state, chosen_ply)
             self.threaded_turn = chosen_ply
             return chosen_ply
         else:
             return ""
     
-    def NegaMax(self, game_stack, player, minmax=1, depth=2, timeout=None, start_time=None, print_space=" "):
+    def start_pondering(self, game_state, ply):
+        """search on in the background, as if ply and the predicted replies were played
+
+        Replies are predicted for every other player up to this AI's next
+        turn (see predict_reply), in the background thread so that get_move
+        returns right away. The search deepens until stop_pondering() or
+        kill_thread(), leaving its results in the transposition table and in
+        self.ponder_result. game_state is used up by the search.
+        """
+        player = game_state.current_player
+        game_state.make_turn(ply)
+        if game_state.get_winner() is not None:
+            return
+        self.ponder_result = None
+        self.ponder_thread = Thread(target=lambda: self.ponder_search(game_state, player))
+        self.ponder_thread.start()
+    
+    def predict_reply(self, game_state, player):
+        """the ply expected of the side to move, by the search player's moves are chosen with
+
+        The best ply stored in the transposition table, else the best of a
+        1-ply search: AlphaBeta for 2 players, Paranoid (the reply worst for
+        player) for more.
+        """
+        paranoid = len(game_state.players) > 2
+        key = game_state.hash
+        if paranoid:
+            key ^= Zobrist.POV_KEYS[game_state.players.index(player)]
+        entry = self.tt.probe(key) if self.tt else None
+        if entry and (entry[4] in game_state.legal_moves or entry[4] in game_state.legal_walls):
+            return entry[4]
+        if paranoid:
+            score, plies = self.Paranoid(game_state, player, depth=1)
+        else:
+            score, plies = self.AlphaBeta(game_state, game_state.current_player, depth=1)
+        return plies[0] if plies else None
+    
+    def ponder_search(self, game_state, player):
+        # play the predicted replies until it is player's turn again
+        while game_state.current_player is not player:
+            reply = None if self.kill else self.predict_reply(game_state, player)
+            if reply is None:
+                return
+            game_state.make_turn(reply)
+            if game_state.get_winner() is not None:
+                return
+        if Endgame.solve(game_state):
+            return
+        history = list(game_state.history)
+        score, plies, stats = self.IterativeDeepening(game_state, None, TreeAI.MAX_DEPTH)
+        if plies:
+            self.ponder_result = (history, self.completed_depth, score, plies)
+    
+    def stop_pondering(self):
+        """stop the ponder search, if any. returns its result (see ponder_result)"""
+        if self.ponder_thread:
+            was_killed = self.kill
+            self.kill = True
+            self.ponder_thread.join()
+            self.kill = was_killed
+            self.ponder_thread = None
+        return self.ponder_result
+    
+    def IterativeDeepening(self, game_state, time_budget=None, max_depth=DEFAULT_DEPTH):
+        """AlphaBeta to depth 1, 2, 3, ... up to max_depth or until time_budget runs out
+        
+        (Paranoid instead of AlphaBeta for more than 2 players.)
+        Each iteration tries the best plies of the previous one first (and
+        the transposition table, if any, does the same at every node below).
+        Returns (best_score, best_plies) of the deepest iteration that finished,
+        and the SearchStats of the whole search.
+        Depth 1 always finishes, so there is a move to play however short the budget.
+        """
+        start_time = time()
+        player = game_state.current_player
+        best_score, best_plies = -TreeAI.INF, []
+        self.completed_depth = 0
+        self.iteration_nodes = []
+        self.new_search()
+        self.stats.start()
+        for depth in range(1, max_depth+1):
+            timeout = time_budget if depth > 1 else None
+            nodes_before = self.stats.nodes
+            if len(game_state.players) > 2:
+                score, plies = self.Paranoid(game_state, player, depth=depth, timeout=timeout,
+                                             start_time=start_time, first_plies=best_plies)
+            elif self.workers > 1:
+                score, plies = ParallelSearch.root_parallel_search(self, game_state, depth, timeout=timeout,
+                                                                   start_time=start_time, first_plies=best_plies)
+            else:
+                score, plies = self.AlphaBeta(game_state, player, depth=depth, timeout=timeout,
+                                              start_time=start_time, first_plies=best_plies)
+            if not plies:
+                # ran out of time (or killed) part way through: keep last full result
+                break
+            best_score, best_plies = score, plies
+            self.completed_depth = depth
+            self.iteration_nodes.append(self.stats.nodes - nodes_before)
+            if abs(best_score) >= TreeAI.WIN_SCORE:
+                # forced win or loss found. deeper won't change that
+                break
+            if time_budget and time()-start_time > time_budget:
+                break
+        self.stats.stop()
+        return best_score, best_plies, self.stats
+    
+    def effective_branching_factor(self):
+        """nodes searched by the last completed iteration / nodes of the one before
+        
+        (or the root's count for a single iteration). Lower means better pruning.
+        """
+        nodes = self.iteration_nodes
+        if len(nodes) >= 2 and nodes[-2]:
+            return float(nodes[-1]) / nodes[-2]
+        elif nodes:
+            return float(nodes[-1])
+        return 0.0
+    
+    def new_search(self):
+        """reset per-search stats and move ordering state (killers), and age the history table"""
+        self.stats = SearchStats(self.timing, self.trace)
+        self.killers = {}
+        self.history_table = [v / 2 for v in self.history_table]
+    
+    def order_plies(self, game_state, plies, height, first_plies):
+        """sort plies so the ones most likely to cause a cutoff come first
+        
+        in order of priority:
+            - first_plies (principal variation / transposition table ply)
+            - pawn moves that shorten the mover's path to goal
+            - killer plies: caused a cutoff at this height in a sibling subtree
+            - everything else, by history table (how often the ply caused
+              cutoffs anywhere, weighted by depth)
+        """
+        first = [p for p in first_plies if p is not None]
+        killers = self.killers.get(height, [])
+        mover = game_state.current_player
+        field = game_state.get_distance_field(mover)
+        # squares closer to goal than where the mover stands now
+        advancing = set(h.point_to_notation(pt) for pt in mover.available_points
+                        if field.distance(pt) < field.distance(mover.position))
+        history_table = self.history_table
+        turn_codes = h.TURN_CODES
+        def priority(ply):
+            if ply in first:
+                return 3*TreeAI.INF - first.index(ply)
+            if ply in advancing:
+                return 2*TreeAI.INF + history_table[turn_codes[ply]]
+            if ply in killers:
+                return TreeAI.INF - killers.index(ply)
+            return history_table[turn_codes[ply]]
+        return sorted(plies, key=priority, reverse=True)
+    
+    def record_cutoff(self, ply, depth, height):
+        """update killers and history after ply caused a beta cutoff"""
+        killers = self.killers.setdefault(height, [])
+        if ply not in killers:
+            killers.insert(0, ply)
+            del killers[TreeAI.NUM_KILLERS:]
+        self.history_table[h.turn_to_code(ply)] += depth * depth
+    
+    def evaluate(self, game_state, player, minmax):
+        """score a leaf, from the point of view of the side to move"""
+        stats = self.stats
+        stats.leaves += 1
+        if stats.timing:
+            t = time()
+            score = minmax * self.score_func(game_state, player)
+            stats.times['eval'] += time()-t
+            return score
+        return minmax * self.score_func(game_state, player)
+    
+    def generate_plies(self, game_state, height, first_plies):
+        """plies to search at a node, best first"""
+        stats = self.stats
+        if stats.timing:
+            t = time()
+        all_plies = TreeAI.get_relevant_plies(game_state)
+        all_plies = self.order_plies(game_state, all_plies, height, first_plies)
+        if stats.timing:
+            stats.times['plies'] += time()-t
+        return all_plies
+    
+    def NegaMax(self, game_state, player, minmax=1, depth=2, timeout=None, start_time=None, height=0):
         """Negamax implementation
         
-        Note: only for 2-player
+        Plays plies in place on game_state with make_turn/unmake_turn.
+        Note: only for 2-player (see Paranoid for more)
         """
-        game_state = game_stack.current
         if not start_time:
             start_time = time()
+        stats = self.stats
+        stats.nodes += 1
         if depth == 0:
-            self.PLY_COUNT += 1
-            return minmax * self.score_func(game_state, player), []
+            return self.evaluate(game_state, player, minmax), []
         #all_plies = game_state.legal_moves + game_state.legal_walls
-        all_plies = TreeAI.get_relevant_plies(game_state, True)
+        all_plies = self.generate_plies(game_state, height, [])
         all_scores = [-TreeAI.INF] * len(all_plies)
         for i in range(len(all_plies)):
             if self.kill or (timeout and time()-start_time > timeout):
                 return -TreeAI.INF, []
             ply = all_plies[i]
-            game_stack.execute_turn(ply)
-            print "(%-3d of %-3d)%s%s" % (i+1, len(all_plies), print_space, ply)
-            ply_score, _ = self.NegaMax(game_stack, player, -minmax, depth-1, timeout, start_time, print_space+"   ")
-            ply_score = -ply_score
-            game_stack.undo()
+            if stats.trace:
+                stats.trace(height, i, len(all_plies), ply)
+            record = self.make_turn(game_state, ply, depth)
+            if game_state.get_winner() is not None:
+                # the ply just played wins the game
+                ply_score = TreeAI.WIN_SCORE + depth
+            else:
+                ply_score, _ = self.NegaMax(game_state, player, -minmax, depth-1, timeout, start_time, height+1)
+                ply_score = -ply_score
+            self.unmake_turn(game_state, record)
             all_scores[i] = ply_score
         
         # all in list with max first
         score_ply = sorted(zip(all_scores, all_plies), reverse=True)
-        if depth==3:
-            print score_ply
         (best_score, _) = score_ply[0]
         best_plies = [p for s, p in score_ply if s == best_score]
         
         # return best score and list of all plies with that score
         return (best_score, best_plies)
     
-    def AlphaBeta(self, game_stack, player, alpha=-INF, beta=INF, minmax=1, depth=2, timeout=None, start_time=None, print_space=" "):
+    def AlphaBeta(self, game_state, player, alpha=-INF, beta=INF, minmax=1, depth=2, timeout=None, start_time=None, height=0, first_plies=None):
         """Alpha-Beta Pruning implementation (on NegaMax)
         
-        Note: only for 2-player
+        Plays plies in place on game_state with make_turn/unmake_turn.
+        height is the number of plies from the root of the search.
+        first_plies (e.g. best plies of a shallower search) are tried first.
+        If the AI has a transposition table, positions already searched deep
+        enough return straight from it (except at the root, which must return
+        all best plies), and the best ply stored for a position is tried first.
+        Counts go to self.stats.
+        Note: only for 2-player (see Paranoid for more)
         """
-        game_state = game_stack.current
         if not start_time:
             start_time = time()
+        stats = self.stats
+        stats.nodes += 1
         if depth == 0:
-            self.PLY_COUNT += 1
-            return minmax * self.score_func(game_state, player), []
+            return self.evaluate(game_state, player, minmax), []
+        
+        alpha_orig = alpha
+        tt_ply = None
+        if self.tt:
+            entry = self.tt.probe(game_state.hash)
+            if entry:
+                _, tt_depth, tt_score, tt_flag, tt_ply = entry
+                if height > 0 and tt_depth >= depth:
+                    if tt_flag == TranspositionTable.EXACT:
+                        stats.tt_cutoffs += 1
+                        return tt_score, [tt_ply]
+                    elif tt_flag == TranspositionTable.LOWER:
+                        alpha = max(alpha, tt_score)
+                    elif tt_flag == TranspositionTable.UPPER:
+                        beta = min(beta, tt_score)
+                    if alpha >= beta:
+                        stats.tt_cutoffs += 1
+                        return tt_score, [tt_ply]
+        
         #all_plies = game_state.legal_moves + game_state.legal_walls
-        all_plies = TreeAI.get_relevant_plies(game_state, True)
+        all_plies = self.generate_plies(game_state, height, (first_plies or [])[:1] + [tt_ply])
         all_scores = [-TreeAI.INF] * len(all_plies)
         for i in range(len(all_plies)):
             if self.kill or (timeout and time()-start_time > timeout):
                 return -TreeAI.INF, []
             ply = all_plies[i]
-            game_stack.execute_turn(ply)
-            if depth==3:
-                print "\n"
-            print "(%-3d of %-3d)%s%s" % (i+1, len(all_plies), print_space, ply)
-            ply_score, _ = self.AlphaBeta(game_stack, player, -beta, -alpha, -minmax, depth-1, timeout, start_time, print_space+"   ")
-            ply_score = -ply_score
-            game_stack.undo()
+            if stats.trace:
+                stats.trace(height, i, len(all_plies), ply)
+            record = self.make_turn(game_state, ply, depth)
+            if game_state.get_winner() is not None:
+                # the ply just played wins the game
+                ply_score = TreeAI.WIN_SCORE + depth
+            else:
+                ply_score, _ = self.AlphaBeta(game_state, player, -beta, -alpha, -minmax, depth-1, timeout, start_time, height+1)
+                ply_score = -ply_score
+            self.unmake_turn(game_state, record)
+            if self.kill or (timeout and time()-start_time > timeout):
+                # the child may have been cut short: don't trust (or store) its
+                #   score, nor count it as a cutoff for killers and history
+                return -TreeAI.INF, []
             all_scores[i] = ply_score
             if ply_score > alpha:
                 alpha = ply_score
             if alpha >= beta:
+                stats.cutoff(depth)
+                self.record_cutoff(ply, depth, height)
                 break
         
         # all in list with max first
         score_ply = sorted(zip(all_scores, all_plies), reverse=True)
-        if depth==3:
-            print score_ply
         (best_score, _) = score_ply[0]
         best_plies = [p for s, p in score_ply if s == best_score]
         
+        if self.tt:
+            if best_score <= alpha_orig:
+                flag = TranspositionTable.UPPER
+            elif best_score >= beta:
+                flag = TranspositionTable.LOWER
+            else:
+                flag = TranspositionTable.EXACT
+            self.tt.store(game_state.hash, depth, best_score, flag, best_plies[0])
+        
         # return best score and list of all plies with that score
         return (best_score, best_plies)
     
+    def Paranoid(self, game_state, player, alpha=-INF, beta=INF, depth=2, timeout=None, start_time=None, height=0, first_plies=None):
+        """Alpha-beta for any number of players, by the paranoid assumption
+        
+        All other players are taken to be playing together against player:
+        player's turns maximize player's score, everyone else's minimize it.
+        That makes it a 2-sided game again, so alpha-beta pruning applies.
+        Scores are always from player's point of view (unlike AlphaBeta,
+        where they are from the side to move's).
+        Transposition table entries are keyed by the position and player.
+        """
+        if not start_time:
+            start_time = time()
+        stats = self.stats
+        stats.nodes += 1
+        if depth == 0:
+            return self.evaluate(game_state, player, 1), []
+        maximizing = game_state.current_player is player
+        player_index = game_state.players.index(player)
+        
+        alpha_orig, beta_orig = alpha, beta
+        tt_ply = None
+        key = game_state.hash ^ Zobrist.POV_KEYS[player_index]
+        if self.tt:
+            entry = self.tt.probe(key)
+            if entry:
+                _, tt_depth, tt_score, tt_flag, tt_ply = entry
+                if height > 0 and tt_depth >= depth:
+                    if tt_flag == TranspositionTable.EXACT:
+                        stats.tt_cutoffs += 1
+                        return tt_score, [tt_ply]
+                    elif tt_flag == TranspositionTable.LOWER:
+                        alpha = max(alpha, tt_score)
+                    elif tt_flag == TranspositionTable.UPPER:
+                        beta = min(beta, tt_score)
+                    if alpha >= beta:
+                        stats.tt_cutoffs += 1
+                        return tt_score, [tt_ply]
+        
+        all_plies = self.generate_plies(game_state, height, (first_plies or [])[:1] + [tt_ply])
+        all_scores = [None] * len(all_plies)
+        for i in range(len(all_plies)):
+            if self.kill or (timeout and time()-start_time > timeout):
+                return -TreeAI.INF, []
+            ply = all_plies[i]
+            if stats.trace:
+                stats.trace(height, i, len(all_plies), ply)
+            record = self.make_turn(game_state, ply, depth)
+            winner = game_state.get_winner()
+            if winner is not None:
+                # the ply just played ends the game: good for player only if they won
+                ply_score = TreeAI.WIN_SCORE + depth
+                if winner is not player:
+                    ply_score = -ply_score
+            else:
+                ply_score, _ = self.Paranoid(game_state, player, alpha, beta, depth-1, timeout, start_time, height+1)
+            self.unmake_turn(game_state, record)
+            if self.kill or (timeout and time()-start_time > timeout):
+                # the child may have been cut short (see AlphaBeta)
+                return -TreeAI.INF, []
+            all_scores[i] = ply_score
+            if maximizing:
+                alpha = max(alpha, ply_score)
+            else:
+                beta = min(beta, ply_score)
+            if alpha >= beta:
+                stats.cutoff(depth)
+                self.record_cutoff(ply, depth, height)
+                break
+        
+        # best for the side to move first
+        score_ply = sorted([(s, p) for s, p in zip(all_scores, all_plies) if s is not None], reverse=maximizing)
+        (best_score, _) = score_ply[0]
+        best_plies = [p for s, p in score_ply if s == best_score]
+        
+        if self.tt:
+            if best_score <= alpha_orig:
+                flag = TranspositionTable.UPPER
+            elif best_score >= beta_orig:
+                flag = TranspositionTable.LOWER
+            else:
+                flag = TranspositionTable.EXACT
+            self.tt.store(key, depth, best_score, flag, best_plies[0])
+        
+        return (best_score, best_plies)
+    
+    def make_turn(self, game_state, ply, depth):
+        """game_state.make_turn, timed if stats are timing. legal plies are skipped above leaves"""
+        if self.stats.timing:
+            t = time()
+            record = game_state.make_turn(ply, update_legal=(depth > 1))
+            self.stats.times['make'] += time()-t
+            return record
+        return game_state.make_turn(ply, update_legal=(depth > 1))
+    
+    def unmake_turn(self, game_state, record):
+        if self.stats.timing:
+            t = time()
+            game_state.unmake_turn(record)
+            self.stats.times['make'] += time()-t
+        else:
+            game_state.unmake_turn(record)
+    
     @staticmethod
     def get_relevant_plies(game_state, verbose=False):
         relevant_walls = []
@@ -0,0 +1,51 @@
+# Zobrist hashing of game positions.
+#   a position's hash is the XOR of one random 64-bit key per feature:
+#   each placed wall, each pawn's square, each player's walls remaining,
+#   and whose turn it is. Changing a feature is 2 XORs (old key out, new key in).
+#   keys come from a fixed seed so hashes are the same in every process/run.
+
+import random
+import Helpers as h
+
+MAX_PLAYERS = 4
+MAX_WALLS = 10
+SEED = 0x51C0D
+
+_rng = random.Random(SEED)
+
+def _key():
+    return _rng.getrandbits(64)
+
+WALL_KEYS = dict((w, _key()) for w in h.all_walls())
+# PAWN_KEYS[player index][(row-1)*9 + (col-1)]
+PAWN_KEYS = [[_key() for sq in range(h.NUM_SQUARES)] for p in range(MAX_PLAYERS)]
+# WALLS_LEFT_KEYS[player index][number of walls left]
+WALLS_LEFT_KEYS = [[_key() for n in range(MAX_WALLS+1)] for p in range(MAX_PLAYERS)]
+# SIDE_KEYS[player index] is in the hash while it's that player's turn
+SIDE_KEYS = [_key() for p in range(MAX_PLAYERS)]
+# POV_KEYS[player index]: mixed into the hash for search results that are from
+#   that player's point of view whoever is to move (see TreeAI.Paranoid).
+#   drawn last so the keys above stay the same
+POV_KEYS = [_key() for p in range(MAX_PLAYERS)]
+
+def pawn_key(player_index, point):
+    row, col = point
+    return PAWN_KEYS[player_index][(row-1)*9 + (col-1)]
+
+def walls_left_key(player_index, num_walls):
+    return WALLS_LEFT_KEYS[player_index][num_walls]
+
+def side_key(player_num):
+    # player numbers start at 1
+    return SIDE_KEYS[player_num-1]
+
+def hash_game(game_state):
+    """full hash of a game state, computed from scratch"""
+    key = 0
+    for w in game_state.walls:
+        key ^= WALL_KEYS[w]
+    for i, p in enumerate(game_state.players):
+        key ^= pawn_key(i, p.position)
+        key ^= walls_left_key(i, p.num_walls)
+    key ^= side_key(game_state.current_player_num)
+    return key
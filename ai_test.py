@@ -8,7 +8,7 @@ gs = Game.Game()
 
 print "MOVES"
 tstart = time.time();
-moves =  Helpers.get_all_legal_moves(gs, 1);
+moves =  Helpers.get_all_legal_moves(gs);
 tend = time.time();
 telapsed = tend-tstart;
 print moves
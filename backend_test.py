@@ -0,0 +1,35 @@
+# board backend test: same game on every backend, compare results and timing
+
+import Game
+import SpecialGraphs
+import random
+import time
+
+NUM_TURNS = 60
+
+def play_random_game(backend, seed, num_players):
+    random.seed(seed)
+    gs = Game.Game(num_players, backend=backend)
+    rng = random.Random(seed)
+    trace = []
+    for i in range(NUM_TURNS):
+        trace.append((sorted(gs.legal_moves), sorted(gs.legal_walls), len(gs.walls)))
+        if rng.random() < 0.5:
+            turn = rng.choice(sorted(gs.legal_moves) + sorted(gs.legal_walls))
+        else:
+            turn = rng.choice(sorted(gs.legal_moves))
+        if gs.execute_turn(turn) != 1:
+            break
+    return trace
+
+for num_players in [2, 4]:
+    print "%d PLAYERS" % num_players
+    traces = {}
+    for backend in sorted(SpecialGraphs.BOARD_BACKENDS.keys()):
+        tstart = time.time()
+        traces[backend] = [play_random_game(backend, seed, num_players) for seed in range(3)]
+        telapsed = time.time() - tstart
+        print "%-10s elapsed time: %f seconds" % (backend, telapsed)
+    reference = traces["graph"]
+    for backend, trace in traces.iteritems():
+        print "%-10s matches graph: %s" % (backend, trace == reference)
@@ -0,0 +1,39 @@
+# opening book test: build a small book, then read it back from the start positions
+
+import os
+import random
+import tempfile
+import Game
+import Helpers as h
+from OpeningBook import OpeningBook, build_book
+
+random.seed(0)
+path = os.path.join(tempfile.mkdtemp(), "test.book")
+n = build_book(path, games=3, book_plies=2, depth=1, num_players=2, verbose=False)
+book = OpeningBook(path)
+print "built %d records, read back %d" % (n, len(book))
+results = [n == len(book) > 0]
+
+for first in [1, 2]:
+    gs = Game.Game(2, starting_player_num=first)
+    legal = h.get_all_legal_turns(gs)
+    entries = book.lookup(gs.hash)
+    choice = book.choose(gs)
+    if entries:
+        ok = all(ply in legal and depth == 1 for ply, depth, score in entries) and choice in legal and \
+            choice in [ply for ply, depth, score in entries if score == entries[0][2]]
+    else:
+        # the book games may all have started with the other player
+        ok = choice is None
+    print "player %d first: %d book plies, chose %s, legal: %s" % (first, len(entries), choice, ok)
+    results.append(ok)
+
+# a position no book game reached
+gs = Game.Game(2, starting_player_num=1)
+gs.replay(["V4a", "V4h", "H8a"])
+results.append(book.choose(gs) is None)
+print "out of book: %s" % book.choose(gs)
+
+book.close()
+os.remove(path)
+print "ALL OK" if all(results) else "FAILED"
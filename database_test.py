@@ -0,0 +1,83 @@
+# game database test: lookup/stats from the index, across several runs and
+#   after they are merged, match a linear scan over all the games
+
+import os
+import random
+import shutil
+import tempfile
+from Game import Game
+import GameDatabase
+from GameRecord import GameRecord
+from Playout import Playout
+
+NUM_GAMES = 120
+GameDatabase.BATCH_GAMES = 10
+GameDatabase.MAX_RUNS = 4
+
+rng = random.Random(0)
+starts = dict(((n, f), Playout(Game(n, starting_player_num=f))) for n in (2, 4) for f in range(1, n+1))
+games = []
+for i in range(NUM_GAMES):
+    n = rng.choice([2, 4])
+    first = rng.randint(1, n)
+    turns = []
+    winner, plies = starts[(n, first)].play(rand=rng, turns=turns, max_plies=60)
+    # a game cut off at max_plies has no winner
+    gs = Game(n, starting_player_num=first)
+    for t in turns:
+        gs.make_turn(t, update_legal=False)
+    won = gs.get_winner()
+    games.append(GameRecord(n, first, turns, gs.players.index(won) + 1 if won else 0, i))
+
+def linear_scan(key):
+    """(game id, ply) of the first time each game reached position key, and stats, the slow way"""
+    found = []
+    for game_id, g in enumerate(games):
+        gs = Game(g.num_players, starting_player_num=g.starting_player_num)
+        hashes = [gs.hash]
+        for t in g.history:
+            gs.make_turn(t, update_legal=False)
+            hashes.append(gs.hash)
+        if key in hashes:
+            found.append((game_id, hashes.index(key)))
+    wins = {}
+    for game_id, ply in found:
+        if games[game_id].winner:
+            wins[games[game_id].winner] = wins.get(games[game_id].winner, 0) + 1
+    return found, {'games': len(found), 'wins': wins, 'draws': len(found) - sum(wins.values())}
+
+path = tempfile.mkdtemp()
+db = GameDatabase.GameDatabase(os.path.join(path, "db"))
+# several add_games calls, several batches each: runs pile up and get merged
+ids = []
+for i in range(0, NUM_GAMES, 40):
+    ids.extend(db.add_games(games[i:i+40]))
+results = [ids == range(NUM_GAMES), len(db.runs) <= GameDatabase.MAX_RUNS]
+print "%d games added, %d index runs after merging" % (len(db), len(db.runs))
+
+# queries: start positions, and positions from the middle of random games
+queries = [Game(n, starting_player_num=f).hash for n, f in sorted(starts)]
+for g in rng.sample(games, 10):
+    gs = Game(g.num_players, starting_player_num=g.starting_player_num)
+    for t in g.history[:rng.randint(1, len(g.history))]:
+        gs.make_turn(t, update_legal=False)
+    queries.append(gs.hash)
+queries.append(12345)
+mismatches = 0
+for key in queries:
+    found, stats = linear_scan(key)
+    if db.lookup(key) != found or db.stats(key) != stats:
+        mismatches += 1
+print "queries: %d, not matching a linear scan: %d" % (len(queries), mismatches)
+results.append(mismatches == 0)
+
+# everything is still there when reopened, and games read back intact
+db.close()
+db = GameDatabase.GameDatabase(os.path.join(path, "db"))
+same = len(db) == NUM_GAMES and all(db.game(i) == games[i] for i in range(NUM_GAMES)) and \
+    db.stats(queries[0]) == linear_scan(queries[0])[1]
+print "reopened: games read back and stats unchanged: %s" % same
+results.append(same)
+db.close()
+shutil.rmtree(path)
+print "ALL OK" if all(results) else "FAILED"
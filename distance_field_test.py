@@ -0,0 +1,47 @@
+# distance field test: after random walls are added and removed (in any order),
+#   the incrementally repaired fields match a fresh BFS, on every board backend
+
+from DistanceField import DistanceField
+import Helpers as h
+import SpecialGraphs
+import random
+
+NUM_STEPS = 300
+GOALS = [[(9, c) for c in range(1, 10)], [(r, 1) for r in range(1, 10)], [(5, 5)]]
+
+def run(backend, seed):
+    rng = random.Random(seed)
+    graph = SpecialGraphs.BoardNet(9, 9, backend)
+    fields = [DistanceField(graph, goals) for goals in GOALS]
+    placed = []
+    free = h.all_walls()
+    mismatches = 0
+    for step in range(NUM_STEPS):
+        # walls may overlap or cut squares off: only the edges matter here
+        if placed and (rng.random() < 0.4 or len(placed) > 40):
+            wall = placed.pop(rng.randrange(len(placed)))
+            free.append(wall)
+            for edge in h.wall_string_to_edges(wall):
+                if not graph.hasEdge(edge) and not any(edge in h.wall_string_to_edges(w) for w in placed):
+                    graph.addEdge(edge, directed=False)
+                    for f in fields:
+                        f.edge_added(edge)
+        else:
+            wall = free.pop(rng.randrange(len(free)))
+            placed.append(wall)
+            for edge in h.wall_string_to_edges(wall):
+                if graph.hasEdge(edge):
+                    graph.removeEdge(edge, directed=False)
+                    for f in fields:
+                        f.edge_removed(edge)
+        for f in fields:
+            if f.dist != DistanceField(graph, f.goals).dist:
+                mismatches += 1
+    return mismatches
+
+results = []
+for backend in sorted(SpecialGraphs.BOARD_BACKENDS.keys()):
+    mismatches = sum(run(backend, seed) for seed in range(3))
+    print "%-10s fields not matching a fresh BFS: %d" % (backend, mismatches)
+    results.append(mismatches == 0)
+print "ALL OK" if all(results) else "FAILED"
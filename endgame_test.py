@@ -0,0 +1,77 @@
+# endgame test: the retrograde table against a brute-force search of the race,
+#   on small boards (corridors walled off from the 9x9 board)
+
+from Endgame import EndgameTable, WIN, LOSS, DRAW, RESULT_NAMES
+from Playout import square, pawn_moves, DOWN_MASK, RIGHT_MASK
+
+# brute force looks this many plies ahead; anything not decided by then is a draw
+MAX_PLIES = 40
+
+def corridor(cols, blocked_down=()):
+    """masks for a board of just the given columns (1-9), with the down edges
+    from blocked_down squares closed too. returns (down_open, right_open, squares)"""
+    squares = [square((r, c)) for r in range(1, 10) for c in cols]
+    down_open = sum(1 << sq for sq in squares) & DOWN_MASK
+    for pt in blocked_down:
+        down_open &= ~(1 << square(pt))
+    right_open = sum(1 << square((r, c)) for r in range(1, 10) for c in cols if c+1 in cols) & RIGHT_MASK
+    return down_open, right_open, squares
+
+def brute_force(table, a, b, turn, k, memo):
+    """WIN/LOSS if the player to move can force it within k plies, else None"""
+    key = (a, b, turn, k)
+    if key in memo:
+        return memo[key]
+    if table.is_over(a, b, turn):
+        value = LOSS
+    elif k == 0:
+        value = None
+    else:
+        values = []
+        for m, j in table.successors(a, b, turn):
+            na, nb = (m, b) if turn == 0 else (a, m)
+            values.append(brute_force(table, na, nb, 1-turn, k-1, memo))
+        if LOSS in values:
+            value = WIN
+        elif values and all(v == WIN for v in values):
+            value = LOSS
+        else:
+            value = None
+    memo[key] = value
+    return value
+
+def check_board(name, cols, blocked_down=()):
+    down_open, right_open, squares = corridor(cols, blocked_down)
+    goal_masks = (sum(1 << square((9, c)) for c in cols), sum(1 << square((1, c)) for c in cols))
+    table = EndgameTable(down_open, right_open, goal_masks)
+    memo = {}
+    wrong = 0
+    counts = {WIN: 0, LOSS: 0, DRAW: 0}
+    for a in squares:
+        for b in squares:
+            if a == b:
+                continue
+            for turn in (0, 1):
+                result, depth = table.value(a, b, turn)
+                counts[result] += 1
+                if result == DRAW:
+                    ok = brute_force(table, a, b, turn, MAX_PLIES, memo) is None
+                else:
+                    ok = brute_force(table, a, b, turn, depth, memo) == result and \
+                         (depth == 0 or brute_force(table, a, b, turn, depth-1, memo) != result)
+                if ok and result == WIN:
+                    # the move chosen keeps the win on schedule
+                    m = table.best_move(a, b, turn)
+                    next_result, next_depth = table.value(m, b, 1) if turn == 0 else table.value(a, m, 0)
+                    ok = next_result == LOSS and next_depth == depth-1
+                wrong += not ok
+    print "%-28s %s, disagreeing with brute force: %d" % \
+        (name, ", ".join("%s %d" % (RESULT_NAMES[r], n) for r, n in sorted(counts.items())), wrong)
+    return wrong == 0
+
+results = [check_board("9x2 corridor", [4, 5]),
+           check_board("9x3 corridor", [4, 5, 6]),
+           check_board("9x3 with a barrier", [4, 5, 6], [(5, 4), (5, 5)]),
+           check_board("9x1 (no passing)", [5]),
+           check_board("9x2 cut in two (draws)", [4, 5], [(5, 4), (5, 5)])]
+print "ALL OK" if all(results) else "FAILED"
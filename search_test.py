@@ -0,0 +1,28 @@
+# search test: TreeAI from the 2- and 4-player start positions, at each depth and on a time budget
+#   (2 players: AlphaBeta, 4 players: Paranoid)
+
+import Game
+import Helpers as h
+from TreeAI import TreeAI
+import time
+
+MAX_DEPTH = 3
+TIME_BUDGET = 2.0
+
+def search(num_players, depth, time_budget=None):
+    gs = Game.Game(num_players, starting_player_num=1)
+    ai = TreeAI()
+    tstart = time.time()
+    score, plies, stats = ai.IterativeDeepening(gs, time_budget, depth)
+    telapsed = time.time() - tstart
+    legal = all(p in h.get_all_legal_turns(gs) for p in plies)
+    print "  depth %d: %7.2f s %7d nodes %6.0f nodes/s  score %6.2f  %-10s legal: %s" % \
+        (ai.completed_depth, telapsed, stats.nodes, stats.nodes_per_second(), score, " ".join(plies[:3]), legal)
+    return ai
+
+for num_players in [2, 4]:
+    print "%d PLAYERS" % num_players
+    for depth in range(1, MAX_DEPTH+1):
+        search(num_players, depth)
+    print " time budget %.1f s:" % TIME_BUDGET
+    search(num_players, TreeAI.MAX_DEPTH, TIME_BUDGET)
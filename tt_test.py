@@ -0,0 +1,45 @@
+# transposition table test: store/probe through a 1-bucket table, so every
+#   store fights over the same depth-preferred and always-replace slots
+
+from TranspositionTable import TranspositionTable
+
+EXACT, LOWER, UPPER = TranspositionTable.EXACT, TranspositionTable.LOWER, TranspositionTable.UPPER
+results = []
+
+def check(label, got, expected):
+    ok = got == expected
+    print "%-55s %s" % (label, "ok" if ok else "FAIL: got %s, expected %s" % (got, expected))
+    results.append(ok)
+
+tt = TranspositionTable(megabytes=0)
+check("one bucket", tt.num_buckets, 1)
+check("probe empty table", tt.probe(1), None)
+
+tt.store(1, 3, 0.5, EXACT, "2e")
+check("A (depth 3) in depth slot", tt.depth_slots[0], (1, 3, 0.5, EXACT, "2e"))
+tt.store(2, 1, -1.0, LOWER, "8e")
+check("B (depth 1) shallower: always slot", tt.always_slots[0], (2, 1, -1.0, LOWER, "8e"))
+check("probe A", tt.probe(1), (1, 3, 0.5, EXACT, "2e"))
+check("probe B", tt.probe(2), (2, 1, -1.0, LOWER, "8e"))
+
+tt.store(3, 2, 2.0, UPPER, "H4d")
+check("C (depth 2) replaces B in always slot", tt.probe(3), (3, 2, 2.0, UPPER, "H4d"))
+check("B gone", tt.probe(2), None)
+check("A kept", tt.probe(1)[1], 3)
+
+tt.store(4, 5, 1.5, EXACT, "V6a")
+check("D (depth 5) takes depth slot", tt.depth_slots[0], (4, 5, 1.5, EXACT, "V6a"))
+check("A demoted to always slot", tt.always_slots[0], (1, 3, 0.5, EXACT, "2e"))
+check("C gone", tt.probe(3), None)
+
+tt.store(4, 1, -0.5, UPPER, "5e")
+check("D again at depth 1: same key replaces depth slot", tt.probe(4), (4, 1, -0.5, UPPER, "5e"))
+check("A still in always slot", tt.probe(1), (1, 3, 0.5, EXACT, "2e"))
+
+stats = tt.stats()
+check("overwrites (B by C, C by A)", stats['overwrites'], 2)
+check("collisions (misses on a full bucket)", stats['collisions'], 2)
+check("fill", stats['fill'], 1.0)
+tt.clear()
+check("clear", (tt.probe(1), tt.probe(4)), (None, None))
+print "ALL OK" if all(results) else "FAILED"
@@ -0,0 +1,51 @@
+# undo test: legal walls after undo match a game replayed fresh to the same point,
+#   whether the turns were executed with or without verify_legal, and
+#   make_turn/unmake_turn find the path-blocking walls already worked out
+
+import Game
+import random
+
+HISTORY = ["2e", "8e", "H3e", "V6f", "3e", "7e", "H6c", "V2b", "2e", "6e"]
+
+def fresh(num_turns):
+    gs = Game.Game(2, starting_player_num=1)
+    gs.replay(HISTORY[:num_turns])
+    return gs
+
+def check(gs, label):
+    expected = fresh(len(gs.history))
+    ok = sorted(gs.legal_walls) == sorted(expected.legal_walls) and \
+        sorted(gs.legal_moves) == sorted(expected.legal_moves)
+    on_board = [w for w in gs.walls if w in gs.legal_walls]
+    print "%-40s matches fresh replay: %s, placed walls reported legal: %s" % (label, ok, on_board or "none")
+    return ok and not on_board
+
+results = []
+for verify in [True, False]:
+    gs = Game.Game(2, starting_player_num=1)
+    gs.replay(HISTORY, verify=verify)
+    while gs.history:
+        gs.undo()
+        results.append(check(gs, "replay(verify=%s), undo to %d turns" % (verify, len(gs.history))))
+
+# unverified turns, then verified ones on top, then undo all
+gs = Game.Game(2, starting_player_num=1)
+gs.replay(HISTORY[:5], verify=False)
+gs.update_all(gs.players)
+gs.replay(HISTORY[5:])
+while gs.history:
+    gs.undo()
+results.append(check(gs, "mixed replay, undo to start"))
+
+# make/unmake: the parent's blocking walls are still cached after unmake
+gs = fresh(len(HISTORY))
+keys = [(i, p.position, gs.walls_key) for i, p in enumerate(gs.players)]
+random.seed(0)
+reused = True
+for i in range(20):
+    record = gs.make_turn(random.choice(gs.legal_walls))
+    gs.unmake_turn(record)
+    reused = reused and all(k in gs.blocking_walls_cache for k in keys)
+results.append(reused)
+print "make/unmake keeps the parent's blocking walls cached: %s" % reused
+print "ALL OK" if all(results) else "FAILED"